@@ -14,26 +14,38 @@
 # -----------------------------------------------
 # Importing required libraries
 import os
-import requests
+import argparse
+from collections import deque
 from bs4 import BeautifulSoup
+from crawler import Crawler
+from crawl_manifest import CrawlManifest, MANIFEST_NAME, CHANGES_NAME, read_changes
+from crawl_journal import CrawlJournal, JOURNAL_NAME
+from page_store import open_pages
 
 # Base URL structure
 base_url = "https://www.bu.edu"
 course_pages_base = "https://www.bu.edu/academics/cas/courses/"
 
-# Directory to store downloaded course HTML files
+# Directory to store downloaded course HTML files (a name ending in ".pages"
+# writes a packed, compressed page store instead of loose files; see page_store.py)
 output_dir = "bu_courses"
-os.makedirs(output_dir, exist_ok=True)
-
-os.environ['OUTPUT_DIR'] = output_dir # Set the environment variable so other scripts can access it
+pages = None
 
 # Function to get course links from a page
-def get_course_links(page_url):
-    """Extracts all course page links from a course listing page."""
-    response = requests.get(page_url)
+def get_course_links(crawler, page_url):
+    """
+    Extracts all course page links from a course listing page. Returns
+    (links, None), or (None, reason) when the page could not be fetched,
+    so a rate-limited listing page is never mistaken for the end of the catalog.
+    """
+    try:
+        response = crawler.fetch(page_url)
+    except Exception as e:
+        print(f"Failed to fetch {page_url}, Error: {e}")
+        return None, e
     if response.status_code != 200:
         print(f"Failed to fetch {page_url}, Status: {response.status_code}")
-        return []
+        return None, f"HTTP {response.status_code}"
 
     soup = BeautifulSoup(response.text, "html.parser")
     course_links = []
@@ -43,39 +55,198 @@ def get_course_links(page_url):
         if href and href.startswith("/academics/cas/courses/"):
             course_links.append(base_url + href)
 
-    return course_links
+    return course_links, None
 
 # Function to save course pages
-def save_course_page(course_url):
-    """Downloads and saves a course page as an HTML file."""
-    response = requests.get(course_url)
-    if response.status_code == 200:
+def save_course_page(crawler, manifest, journal, course_url):
+    """Downloads and saves a course page as an HTML file, skipping pages that have not changed."""
+    try:
+        response = crawler.fetch(course_url, headers=manifest.conditional_headers(course_url))
+    except Exception as e:
+        print(f"Failed to fetch {course_url}, Error: {e}")
+        journal.record_failed(course_url, e)
+        return
+
+    if response.status_code == 304:
+        manifest.not_modified(course_url)
+        journal.record_done(course_url)
+    elif response.status_code == 200:
         course_code = course_url.rstrip("/").split("/")[-1]
-        file_path = os.path.join(output_dir, f"{course_code}.html")
-        
-        with open(file_path, "w", encoding="utf-8") as file:
-            file.write(response.text)
-        
-        print(f"Saved: {file_path}")
+        file_path = pages.path_for(course_code)
+
+        if manifest.update(course_url, response, file_path):
+            pages.put(course_code, response.text.encode("utf-8"))
+
+            print(f"Saved: {file_path}")
+        journal.record_done(course_url)
     else:
         print(f"Failed to fetch {course_url}, Status: {response.status_code}")
+        journal.record_failed(course_url, f"HTTP {response.status_code}")
+
+def crawl(crawler, manifest, journal, listing_lookahead=4):
+    """
+    Walks the course listing pages and downloads every course page.
+
+    Listing pages are fetched a few pages ahead on the worker pool, and each
+    course page is queued for download as soon as its listing page arrives,
+    so discovery and downloading overlap. The walk stops at the first listing
+    page with no course links. A listing page that still fails after retries
+    is journaled as failed (for --retry-failed) and the walk goes on; after
+    `listing_lookahead` failures in a row it stops without an end, so the
+    crawl stays incomplete and the next run resumes it.
+
+    Progress is journaled, so after a crash the walk resumes from the first
+    listing page not yet journaled and only downloads URLs still pending.
+    """
+    downloads = []
+
+    # Resume: re-queue everything discovered last time that never finished
+    for course_url in journal.pending():
+        downloads.append(crawler.submit(save_course_page, crawler, manifest, journal, course_url))
+
+    next_page = 1
+    while journal.has_listing(next_page) or journal.has_failed_listing(next_page):
+        next_page += 1
+    if next_page > 1:
+        print(f"Resuming: {len(downloads)} pending pages, listing walk continues at page {next_page}.")
+
+    pending_listings = deque()
+    failures_in_a_row = 0
+    while journal.listing_end is None:
+        # Keep a few listing pages in flight ahead of the one being processed
+        while len(pending_listings) < listing_lookahead:
+            page_url = f"{course_pages_base}{next_page}/"
+            pending_listings.append((next_page, crawler.submit(get_course_links, crawler, page_url)))
+            next_page += 1
 
-# Loop through course listing pages
-page_num = 1
-while True:
-    page_url = f"{course_pages_base}{page_num}/"
-    print(f"Fetching course list from: {page_url}")
+        page_num, listing = pending_listings.popleft()
+        print(f"Fetching course list from: {course_pages_base}{page_num}/")
+        course_links, reason = listing.result()
 
-    course_links = get_course_links(page_url)
+        if course_links is None:
+            journal.record_listing_failed(page_num, reason)
+            failures_in_a_row += 1
+            if failures_in_a_row >= listing_lookahead:
+                print(f"{failures_in_a_row} listing pages failed in a row. Stopping at page {page_num}.")
+                break
+            continue
+        failures_in_a_row = 0
 
-    if not course_links:
-        print(f"No more courses found. Stopping at page {page_num}.")
-        break  # Stop if no course links are found
+        if not course_links:
+            print(f"No more courses found. Stopping at page {page_num}.")
+            journal.record_listing_end(page_num)
+            break  # Stop if no course links are found
 
-    for course_url in course_links:
-        save_course_page(course_url)
+        journal.record_listing(page_num, course_links)
+        for course_url in course_links:
+            downloads.append(crawler.submit(save_course_page, crawler, manifest, journal, course_url))
+
+    # Let the speculative listing fetches finish, then wait for every download
+    for _, listing in pending_listings:
+        listing.result()
+    for download in downloads:
+        download.result()
+
+def retry_failed(crawler, manifest, journal):
+    """
+    Second pass: re-walks the listing pages and retries the URLs the journal
+    has recorded as failed, and downloads the course pages found on the
+    re-walked listings. A re-walked listing with no course links is the end
+    of the listings. If the last re-walked listing still had courses, the
+    first pass stopped on failures before reaching the end, so the walk goes
+    on from there.
+    """
+    failed_listings = journal.failed_listing_keys()
+    failed = journal.failed_urls()
+    print(f"Retrying {len(failed_listings)} failed listing pages and {len(failed)} failed pages.")
+    downloads = [crawler.submit(save_course_page, crawler, manifest, journal, url) for url in failed]
+    queued = set(failed)
+
+    listings = [(key, crawler.submit(get_course_links, crawler, f"{course_pages_base}{key}/"))
+                for key in failed_listings]
+    last_listing = max(failed_listings, key=int, default=None)
+    walk_on = False
+    for key, listing in listings:
+        course_links, reason = listing.result()
+        if course_links is None:
+            journal.record_listing_failed(key, reason)
+            continue
+        if not course_links:
+            journal.record_listing_end(key)
+            continue
+        journal.record_listing(key, course_links)
+        walk_on = walk_on or key == last_listing
+        for course_url in course_links:
+            if course_url not in queued and course_url not in journal.done:
+                queued.add(course_url)
+                downloads.append(crawler.submit(save_course_page, crawler, manifest, journal, course_url))
+    for download in downloads:
+        download.result()
+
+    if walk_on and journal.listing_end is None:
+        print(f"Listing page {last_listing} has courses; continuing the listing walk after it.")
+        crawl(crawler, manifest, journal)
+
+def run(datasets=None, workers=8, rate=10.0, retries=4, site=None, output=None,
+        retry_only_failed=False, fresh=False):
+    """
+    Pipeline entry point: crawls the catalog (incrementally, resuming any
+    interrupted crawl) and returns {"bu_pages": the folder or store written}.
+    """
+    global base_url, course_pages_base, output_dir, pages
+    base_url = (site or base_url).rstrip("/")
+    course_pages_base = base_url + "/academics/cas/courses/"
+    output_dir = (output or output_dir).rstrip("/")
+    pages = open_pages(output_dir)
+
+    # The manifest remembers each page's validators and hash so re-runs only rewrite changed pages
+    manifest = CrawlManifest(os.path.join(output_dir, MANIFEST_NAME), exists=pages.has_path)
+    changes_path = os.path.join(output_dir, CHANGES_NAME)
+
+    # The journal makes the crawl resumable: an interrupted run picks up where it stopped
+    journal = CrawlJournal(os.path.join(output_dir, JOURNAL_NAME), fresh=fresh)
+    if journal.listings:
+        print(f"Found crawl journal: {journal.summary()}")
+        manifest.changed.extend(read_changes(changes_path))  # Keep the interrupted run's changes
+
+    try:
+        with Crawler(max_workers=workers, per_host_rate=rate, max_retries=retries) as crawler:
+            if retry_only_failed:
+                retry_failed(crawler, manifest, journal)
+            else:
+                crawl(crawler, manifest, journal)
+    finally:
+        # Saved after the crawler has shut down so in-flight downloads are included
+        pages.close()
+        manifest.save()
+        manifest.write_changes(changes_path)
+    print(crawler.report())
+    print(manifest.summary())
+
+    print(journal.summary())
+    if journal.is_complete():
+        journal.close(remove=True)  # Finished cleanly; the next run is a fresh (incremental) crawl
+        print("All course pages have been downloaded.")
+    else:
+        journal.close()
+        print("Some pages failed. Run again with --retry-failed to retry them.")
+    return {"bu_pages": output_dir}
 
-    page_num += 1  # Move to the next page
 
-print("All course pages have been downloaded.")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the BU CAS course catalog pages.")
+    parser.add_argument("--workers", type=int, default=8, help="Maximum requests in flight")
+    parser.add_argument("--rate", type=float, default=10.0, help="Maximum requests per second per host")
+    parser.add_argument("--retries", type=int, default=4, help="Retries for 429/5xx responses")
+    parser.add_argument("--base-url", default=base_url,
+                        help="Site root to crawl, e.g. a local stand-in server from crawler.py")
+    parser.add_argument("--output-dir", default=output_dir,
+                        help="Folder for .html files, or a .pages store to pack pages into")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Only retry the pages the previous crawl journaled as failed")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Discard any interrupted crawl journal and start from page 1")
+    args = parser.parse_args()
 
+    run(workers=args.workers, rate=args.rate, retries=args.retries, site=args.base_url,
+        output=args.output_dir, retry_only_failed=args.retry_failed, fresh=args.fresh)
@@ -8,23 +8,32 @@
 #  python or javascript.
 # -----------------------------------------------
 # import libraries
-import glob
 import os
+from page_store import open_pages, decode_page
 
 # Define folder and output file
 # folderptah = output_dir
 folderpath = os.environ.get("OUTPUT_DIR", "bu_courses")+"/"
 #folderpath = "bu_courses2/"
 output_file = "02_mergedhtmlsbu.html"
-os.environ['OUTPUT_FILE'] = output_file # Set the environment variable so other scripts can access it
 
-# Get all HTML files in the folder
-html_files = glob.glob(folderpath + "*.html")
 
-# Merge all HTML files into one
-with open(folderpath+output_file, "w", encoding="utf-8") as outfile:
-    for file in html_files:
-        with open(file, "r", encoding="utf-8") as infile:
-            outfile.write(infile.read() + "\n")  # Read and append content with a newline
+def run(datasets=None):
+    """Pipeline entry point: merges the crawled pages into one HTML document next to them."""
+    os.environ['OUTPUT_FILE'] = output_file # Set the environment variable so other scripts can access it
+    folder = (datasets or {}).get("bu_pages", folderpath).rstrip("/") + "/"
 
-print(f"Merged {len(html_files)} HTML files into {output_file}")
\ No newline at end of file
+    # Open the downloaded pages (a folder of HTML files or a packed .pages store)
+    pages = open_pages(folder, exclude=(output_file,))
+
+    # Merge all HTML pages into one
+    with pages, open(folder+output_file, "w", encoding="utf-8") as outfile:
+        for course_code, data in pages.iter_pages():
+            outfile.write(decode_page(data) + "\n")  # Append content with a newline
+
+    print(f"Merged {len(pages)} HTML files into {output_file}")
+    return {}
+
+
+if __name__ == "__main__":
+    run()
@@ -15,27 +15,29 @@
 #           https://developer.mozilla.org/en-US/docs/Web/JavaScript/Guide/Regular_expressions
 # -----------------------------------------------
 # import needed libraries
-import json
 import os
+import re
+import sys
+import argparse
+from collections import deque
 from bs4 import BeautifulSoup
+from page_store import open_pages, decode_page
+from parse_cache import ParseCache, MAX_BYTES
+from records import write_records, tee_records
 
-# Load the raw HTML file
+# Where the downloaded pages live (a folder of HTML files or a packed .pages store)
 #html_file = folderpath+outputfile  # Update this if needed
-html_file=os.environ.get("OUTPUT_DIR", "bu_courses")+"/"+os.environ.get("OUTPUT_FILE", "02_mergedhtmlsbu.html")
+pages_dir = os.environ.get("OUTPUT_DIR", "bu_courses")
+merged_name = os.environ.get("OUTPUT_FILE", "02_mergedhtmlsbu.html")
 #html_file = "bu_courses/mergedhtmlsbu.html"  # Update this if needed
+output_file = "04_cleaned_courses.jsonl"     # Clean, typed records (same format as 04_clean.py)
+raw_output_file = "03_parsed_courses.jsonl"  # Raw-HTML intermediate, only written with --raw-html
 
-with open(html_file, "r", encoding="utf-8") as file:
-    raw_html = file.read()
+# Bump whenever parse_course()/extract_course() change what they extract, so cached records are not reused
+PARSER_VERSION = "03-parse-2"
 
-# Parse the HTML
-soup = BeautifulSoup(raw_html, "html.parser")
-
-# Find all course sections
-courses = soup.find_all("div", id="col1")  # Assuming all courses are under "col1"
-
-parsed_courses = []
-
-for course in courses:
+def parse_course(course):
+    """Extracts one course record (fields kept as raw HTML) from a div#col1 element."""
     # Extract Course Title
     title = str(course.find("h1"))  # Store raw HTML
     code = str(course.find("h2"))
@@ -69,18 +71,422 @@ for course in courses:
                     "notes": cols[4]
                 })
 
-    parsed_courses.append({
+    return {
+        "title": title,
+        "code": code,
+        "description": description,
+        "units": units,
+        "schedule": schedule_data
+    }
+
+def units_value(text):
+    """Units as an int, or "N/A" when the catalog lists none or a non-numeric value such as "Var"."""
+    return int(text) if text.isdigit() else "N/A"
+
+def extract_course(course):
+    """
+    Extracts one clean, typed course record from a div#col1 element in a
+    single pass: text is taken straight from the DOM (entities decoded),
+    units become an int and each schedule row a dict of plain strings.
+    """
+    def text(tag):
+        return tag.get_text().strip() if tag else "N/A"
+
+    course_content = course.find("div", id="course-content")
+    description = text(course_content.find("p")) if course_content else "N/A"
+
+    units = "N/A"
+    if course_content:
+        units_tag = course_content.find("dt", string="Units:")
+        if units_tag:
+            units = units_value(text(units_tag.find_next_sibling("dd")))
+
+    schedule_data = []
+    schedule_table = course.find("div", class_="cf-course")
+    if schedule_table:
+        for row in schedule_table.find_all("tr")[1:]:  # Skip table header row
+            cols = [text(col) for col in row.find_all("td")]
+            if len(cols) == 5:
+                schedule_data.append(dict(zip(SCHEDULE_FIELDS, cols)))
+
+    return {
+        "title": text(course.find("h1")),
+        "code": text(course.find("h2")).upper(),
+        "description": description,
+        "units": units,
+        "schedule": schedule_data
+    }
+
+SCHEDULE_FIELDS = ("section", "instructor", "location", "schedule", "notes")
+
+def parse_html(html, raw=False):
+    """
+    Yields a course record for every course section (div#col1) in an HTML
+    document: clean and typed by default, raw HTML fields if `raw`.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    extract = parse_course if raw else extract_course
+    for course in soup.find_all("div", id="col1"):  # Assuming all courses are under "col1"
+        yield extract(course)
+
+#==============================================================================
+# PARSER BACKENDS
+#==============================================================================
+# Almost all of a BU page is site navigation and template; everything a course
+# record needs lives inside div#col1. The fast backends cut that region out of
+# the raw bytes with a cheap scan and only parse the fragment.
+#
+#   "html.parser"  whole page through BeautifulSoup + html.parser (reference)
+#   "fragment"     div#col1 fragment through BeautifulSoup + html.parser
+#   "lxml"         div#col1 fragment through lxml, with fields serialized
+#                  exactly as BeautifulSoup would; fragments with mis-nested
+#                  markup (which lxml repairs differently) fall back to
+#                  "fragment"
+#
+# All backends must produce identical records; --check-backends verifies it.
+
+COL1_START = re.compile(rb'<div\b[^>]*\bid="col1"')
+DIV_TAG = re.compile(rb'<(/?)div\b', re.IGNORECASE)
+HTML_TAG = re.compile(r'<!--.*?-->|<(/?)([a-zA-Z][a-zA-Z0-9]*)\b[^>]*?(/?)>', re.DOTALL)
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+             "param", "source", "track", "wbr"}
+BLOCK_TAGS = {"div", "p", "ul", "ol", "dl", "table", "form", "blockquote", "pre", "section",
+              "h1", "h2", "h3", "h4", "h5", "h6"}
+
+def slice_col1(data):
+    """Returns the bytes of the div#col1 element in a raw page, or None if it has none."""
+    start = COL1_START.search(data)
+    if not start:
+        return None
+    depth = 0
+    for tag in DIV_TAG.finditer(data, start.start()):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            return data[start.start():data.find(b">", tag.end()) + 1]
+    return data[start.start():]  # Unclosed; let the parser deal with it
+
+def is_well_nested(fragment):
+    """True if every tag in `fragment` closes in order and nothing is nested where parsers disagree."""
+    open_tags = []
+    for tag in HTML_TAG.finditer(fragment):
+        name = tag.group(2)
+        if name is None:
+            continue  # Comment
+        name = name.lower()
+        if tag.group(1):
+            if not open_tags or open_tags[-1] != name:
+                return False
+            open_tags.pop()
+        elif name in VOID_TAGS or tag.group(3):
+            continue
+        else:
+            if (name == "a" and "a" in open_tags) or (name in BLOCK_TAGS and "p" in open_tags):
+                return False
+            open_tags.append(name)
+    return not open_tags
+
+def parse_page_reference(data, raw=False):
+    return list(parse_html(decode_page(data), raw))
+
+def parse_page_fragment(data, raw=False):
+    fragment = slice_col1(data)
+    return list(parse_html(decode_page(fragment), raw)) if fragment else []
+
+def parse_page_lxml(data, raw=False):
+    fragment = slice_col1(data)
+    if not fragment:
+        return []
+    html = decode_page(fragment)
+    if not is_well_nested(html):
+        return list(parse_html(html, raw))
+    import lxml.html
+    course = lxml.html.fragment_fromstring(html)
+    return [parse_course_lxml(course) if raw else extract_course_lxml(course)]
+
+def _first(element, tag, match=None):
+    """First descendant of `element` with `tag` (and `match`), like BeautifulSoup's find()."""
+    for child in element.iter(tag):
+        if child is not element and (match is None or match(child)):
+            return child
+    return None
+
+def _escape(text, attribute=False):
+    text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return text.replace('"', "&quot;") if attribute else text
+
+def _serialize(element, out):
+    if not isinstance(element.tag, str):
+        out.append(f"<!--{element.text}-->")  # Comment
+    else:
+        attributes = "".join(
+            # BeautifulSoup treats class as a list of names and re-joins it with single spaces
+            f' {name}="{_escape(" ".join(value.split()) if name == "class" else value, True)}"'
+            for name, value in element.attrib.items())
+        if element.tag in VOID_TAGS:
+            out.append(f"<{element.tag}{attributes}/>")
+        else:
+            out.append(f"<{element.tag}{attributes}>")
+            if element.text:
+                out.append(_escape(element.text))
+            for child in element:
+                _serialize(child, out)
+            out.append(f"</{element.tag}>")
+    if element.tail:
+        out.append(_escape(element.tail))
+
+def to_html(element):
+    """Serializes an lxml element exactly as str() does for the same BeautifulSoup tag."""
+    if element is None:
+        return "None"
+    out = []
+    tail, element.tail = element.tail, None
+    _serialize(element, out)
+    element.tail = tail
+    return "".join(out)
+
+def parse_course_lxml(course):
+    """lxml twin of parse_course(); must stay field-for-field identical to it."""
+    title = to_html(_first(course, "h1"))
+    code = to_html(_first(course, "h2"))
+
+    description = "N/A"
+    course_content = _first(course, "div", lambda e: e.get("id") == "course-content")
+    if course_content is not None:
+        paragraph = _first(course_content, "p")
+        if paragraph is not None:
+            description = to_html(paragraph)
+
+    # parse_course() looks for <dt String="Units:">; parsers lower-case attribute names so it never matches
+    units = "N/A"
+
+    schedule_data = []
+    schedule_table = _first(course, "div", lambda e: "cf-course" in e.get("class", "").split())
+    if schedule_table is not None:
+        rows = list(schedule_table.iter("tr"))[1:]  # Skip table header row
+        for row in rows:
+            cols = [to_html(col) for col in row.iter("td")]
+            if len(cols) == 5:
+                schedule_data.append({
+                    "section": cols[0],
+                    "instructor": cols[1],
+                    "location": cols[2],
+                    "schedule": cols[3],
+                    "notes": cols[4]
+                })
+
+    return {
         "title": title,
         "code": code,
         "description": description,
         "units": units,
         "schedule": schedule_data
-    })
+    }
+
+def extract_course_lxml(course):
+    """lxml twin of extract_course(); must stay field-for-field identical to it."""
+    def text(element):
+        return element.text_content().strip() if element is not None else "N/A"
+
+    course_content = _first(course, "div", lambda e: e.get("id") == "course-content")
+    description = "N/A"
+    units = "N/A"
+    if course_content is not None:
+        description = text(_first(course_content, "p"))
+        # Same match as find("dt", string="Units:"): a dt whose only content is exactly "Units:"
+        units_tag = _first(course_content, "dt", lambda e: e.text == "Units:" and len(e) == 0)
+        if units_tag is not None:
+            units = units_value(text(next(units_tag.itersiblings("dd"), None)))
+
+    schedule_data = []
+    schedule_table = _first(course, "div", lambda e: "cf-course" in e.get("class", "").split())
+    if schedule_table is not None:
+        for row in list(schedule_table.iter("tr"))[1:]:  # Skip table header row
+            cols = [text(col) for col in row.iter("td")]
+            if len(cols) == 5:
+                schedule_data.append(dict(zip(SCHEDULE_FIELDS, cols)))
+
+    return {
+        "title": text(_first(course, "h1")),
+        "code": text(_first(course, "h2")).upper(),
+        "description": description,
+        "units": units,
+        "schedule": schedule_data
+    }
+
+BACKENDS = {
+    "html.parser": parse_page_reference,
+    "fragment": parse_page_fragment,
+    "lxml": parse_page_lxml,
+}
+
+def default_backend():
+    try:
+        import lxml.html  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "fragment"
+
+def check_backends(pages, raw=False):
+    """Parses every page with every backend and reports pages whose records differ from the reference."""
+    mismatches = 0
+    for course_code, data in pages.iter_pages():
+        expected = parse_page_reference(data, raw)
+        for name, parse_page in BACKENDS.items():
+            if parse_page(data, raw) != expected:
+                mismatches += 1
+                print(f"Mismatch: backend '{name}' on {course_code}")
+    return mismatches
+
+def cached_parse(data, parse_page, cache=None, raw=False):
+    """Parses one page's bytes, or returns its records from the cache if the page was seen before."""
+    if cache is None:
+        return parse_page(data, raw)
+    key = cache.key(data)
+    records = cache.get(key)
+    if records is None:
+        records = parse_page(data, raw)
+        cache.put(key, records)
+    return records
+
+def iter_courses(pages, backend="html.parser", cache=None, raw=False):
+    """
+    Streams course records page by page: each page is parsed on its own and
+    its tree discarded before the next is read, so memory use stays flat no
+    matter how many pages there are.
+    """
+    parse_page = BACKENDS[backend]
+    for course_code, data in pages.iter_pages():
+        yield from cached_parse(data, parse_page, cache, raw)
+
+# Each worker process opens a page source once and reuses it for every shard, keyed on its path
+_worker_pages = {}
+
+def parse_shard(source, keys, backend="html.parser", raw=False):
+    """Worker: parses one shard of the pages in `source` and returns {page key: records}."""
+    pages = _worker_pages.get(source)
+    if pages is None:
+        pages = _worker_pages[source] = open_pages(source, exclude=(merged_name,))
+    parse_page = BACKENDS[backend]
+    return {course_code: parse_page(data, raw) for course_code, data in pages.iter_pages(keys)}
+
+def _reset_worker_pages():
+    """Pool initializer: drops any page source a forked worker inherited, so each run reopens its own."""
+    _worker_pages.clear()
+
+def _submit_shard(pool, pages, shard, backend, cache, raw):
+    """Looks the shard's pages up in the cache and sends only the misses to a worker."""
+    entries, cached, misses = [], {}, []
+    for course_code in shard:
+        digest = None
+        if cache is not None:
+            digest = cache.key(pages.get(course_code))
+            records = cache.get(digest)
+            if records is not None:
+                cached[course_code] = records
+        if course_code not in cached:
+            misses.append(course_code)
+        entries.append((course_code, digest))
+    future = pool.submit(parse_shard, pages.path, misses, backend, raw) if misses else None
+    return entries, cached, future
+
+def _collect_shard(shard, cache):
+    entries, cached, future = shard
+    parsed = future.result() if future else {}
+    for course_code, digest in entries:
+        if course_code in cached:
+            yield from cached[course_code]
+        else:
+            if cache is not None:
+                cache.put(digest, parsed[course_code])
+            yield from parsed[course_code]
+
+def iter_courses_parallel(pages, workers, backend="html.parser", cache=None, raw=False, shard_size=32):
+    """
+    Shards the pages across a process pool and parses the shards in parallel.
+    Shards are contiguous runs of sorted page keys (course codes) and results
+    are merged back in shard order, so the output is identical to the serial
+    parse regardless of worker count or scheduling. Only a few shards per
+    worker are in flight at once, so memory stays bounded.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    keys = pages.keys()
+    shards = [keys[i:i + shard_size] for i in range(0, len(keys), shard_size)]
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_reset_worker_pages) as pool:
+        for shard in shards:
+            in_flight.append(_submit_shard(pool, pages, shard, backend, cache, raw))
+            if len(in_flight) >= workers * 4:
+                yield from _collect_shard(in_flight.popleft(), cache)
+        while in_flight:
+            yield from _collect_shard(in_flight.popleft(), cache)
+
+def run(datasets=None, raw=False, merged=False, workers=1, backend=None, use_cache=True,
+        cache_size=MAX_BYTES // 2**20, compress=False, keep=False):
+    """
+    Pipeline entry point: parses the crawled pages and writes the records.
+    With `keep` (the pipeline runner asks for it when a later stage runs in
+    the same process) also returns them in memory as {"cleaned_courses":
+    [...]} (or {"parsed_courses": [...]} with raw=True); otherwise the
+    records stream straight to the file and {} is returned.
+    """
+    source = (datasets or {}).get("bu_pages", pages_dir)
+    workers = workers or os.cpu_count()
+    backend = backend or default_backend()
+    target_file = (raw_output_file if raw else output_file) + (".gz" if compress else "")
+    kept = [] if keep else None
+
+    cache = None
+    if merged:
+        # Legacy mode: load and parse the whole merged document at once
+        with open(os.path.join(source, merged_name), "r", encoding="utf-8") as file:
+            courses = parse_html(file.read(), raw)
+            count = write_records("output_folder/" + target_file, tee_records(courses, kept))
+    else:
+        # Unchanged pages are served from the cache instead of being parsed again
+        if use_cache:
+            cache = ParseCache(version=PARSER_VERSION + ("-raw" if raw else ""),
+                               max_bytes=cache_size * 2**20)
+        with open_pages(source, exclude=(merged_name,)) as pages:
+            if workers > 1:
+                courses = iter_courses_parallel(pages, workers, backend, cache, raw)
+            else:
+                courses = iter_courses(pages, backend, cache, raw)
+            count = write_records("output_folder/" + target_file, tee_records(courses, kept))
+
+    if cache is not None:
+        cache.close()
+        print(cache.summary())
+    print(f"Parsing complete. {count} courses saved to {target_file}")
+    return {"parsed_courses" if raw else "cleaned_courses": kept} if keep else {}
+
 
-# Save parsed data to JSON file
-with open("output_folder/03_parsed_courses.json", "w", encoding="utf-8") as file:
-    json.dump(parsed_courses, file, indent=4)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract clean course records from BU course pages.")
+    parser.add_argument("--raw-html", action="store_true",
+                        help=f"Debugging: write raw HTML fields to {raw_output_file} for 04_clean.py "
+                             f"instead of clean records to {output_file}")
+    parser.add_argument("--merged", action="store_true",
+                        help=f"Parse the single merged document from 02_combine.py ({merged_name}) "
+                             "instead of streaming the pages one at a time")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Parser processes to shard the pages across (0 = one per CPU core)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=default_backend(),
+                        help="Page parser backend (default: lxml when installed)")
+    parser.add_argument("--check-backends", action="store_true",
+                        help="Verify every backend produces the reference records, then exit")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Parse every page even if an identical page was parsed before")
+    parser.add_argument("--cache-size", type=int, default=MAX_BYTES // 2**20,
+                        help="Parse cache size limit in MB")
+    parser.add_argument("--compress", action="store_true", help="gzip the JSON Lines output")
+    args = parser.parse_args()
 
-print("Parsing complete. Data saved to 03_parsed_courses.json")
-os.environ['Output_JSON'] = "03_parsed_courses.json"
+    if args.check_backends:
+        with open_pages(pages_dir, exclude=(merged_name,)) as pages:
+            mismatches = check_backends(pages, args.raw_html)
+        print(f"Backend check complete: {mismatches} mismatches across {len(pages)} pages.")
+        sys.exit(1 if mismatches else 0)
 
+    run(raw=args.raw_html, merged=args.merged, workers=args.workers, backend=args.backend,
+        use_cache=not args.no_cache, cache_size=args.cache_size, compress=args.compress)
@@ -11,13 +11,16 @@
 import json
 import re
 import os
-from bs4 import BeautifulSoup
+import argparse
+from parse_cache import ParseCache
+from records import read_records, write_records, tee_records
 
-# Load the raw parsed JSON file
-parsed_file = os.environ.get("Output_JSON", "03_parsed_courses.json")
+# Bump whenever clean_course() changes its output, so cached results are not reused
+CLEANER_VERSION = "04-clean-1"
+
+# The raw parsed records from 03_parse.py --raw-html
+parsed_file = os.environ.get("Output_JSON", "03_parsed_courses.jsonl")
 #parsed_file = "parsed_courses.json"
-with open("output_folder/"+parsed_file, "r", encoding="utf-8") as file:
-    raw_courses = json.load(file)
 
 # Function to clean HTML tags
 def clean_html_tags(text):
@@ -26,10 +29,8 @@ def clean_html_tags(text):
         return "N/A"
     return re.sub(r"<.*?>", "", text).strip()
 
-# Process and clean data
-cleaned_courses = []
-
-for course in raw_courses:
+def clean_course(course):
+    """Cleans one raw course record from 03_parse.py."""
     cleaned_course = {
         "title": clean_html_tags(course["title"]),
         "code": clean_html_tags(course["code"]).upper(),
@@ -48,12 +49,48 @@ for course in raw_courses:
             "notes": clean_html_tags(row["notes"])
         })
 
-    cleaned_courses.append(cleaned_course)
+    return cleaned_course
+
+def cached_clean(course, cache=None):
+    """Cleans a record, or returns the cached result if an identical record was cleaned before."""
+    if cache is None:
+        return clean_course(course)
+    key = cache.key(json.dumps(course, sort_keys=True).encode("utf-8"))
+    cleaned_course = cache.get(key)
+    if cleaned_course is None:
+        cleaned_course = clean_course(course)
+        cache.put(key, cleaned_course)
+    return cleaned_course
+
+def run(datasets=None, use_cache=True, compress=False, keep=False):
+    """
+    Pipeline entry point: cleans the raw records (from memory when 03 just
+    produced them, otherwise from its output file) and writes them. With
+    `keep` also returns them as {"cleaned_courses": [...]}, otherwise {}.
+    """
+    raw_courses = (datasets or {}).get("parsed_courses")
+    if raw_courses is None:
+        raw_courses = read_records("output_folder/"+parsed_file)
+
+    # Stream the records through, reusing results for records that have not changed
+    cleaned_file = "04_cleaned_courses.jsonl" + (".gz" if compress else "")
+    cache = ParseCache(version=CLEANER_VERSION) if use_cache else None
+    kept = [] if keep else None
+    cleaned = (cached_clean(course, cache) for course in raw_courses)
+    count = write_records('output_folder/'+cleaned_file, tee_records(cleaned, kept))
+    if cache is not None:
+        cache.close()
+        print(cache.summary())
+
+    print(f"Data cleaning complete. {count} cleaned courses saved to {cleaned_file}")
+    return {"cleaned_courses": kept} if keep else {}
+
 
-# Save the cleaned data to a new JSON file
-cleaned_file = "04_cleaned_courses.json"
-with open('output_folder/'+cleaned_file, "w", encoding="utf-8") as file:
-    json.dump(cleaned_courses, file, indent=4)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean the raw course records from 03_parse.py.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Clean every record even if an identical record was cleaned before")
+    parser.add_argument("--compress", action="store_true", help="gzip the JSON Lines output")
+    args = parser.parse_args()
 
-os.environ['Cleaned_JSON'] = cleaned_file
-print(f"Data cleaning complete. Cleaned data saved to {cleaned_file}")
+    run(use_cache=not args.no_cache, compress=args.compress)
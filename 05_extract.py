@@ -4,22 +4,29 @@
 #  Objective: Extract course titles from 
 #  the data you cleaned.
 # -----------------------------------------------
-import json
 import os
+from records import read_records
 
-# Load the cleaned JSON file
-cleaned_file = os.environ.get("Cleaned_JSON", "04_cleaned_courses.json")
-#cleaned_file = "cleaned_courses.json"
-with open("output_folder/"+cleaned_file, "r", encoding="utf-8") as file:
-    cleaned_courses = json.load(file)
+# Stream the cleaned records (JSON Lines) from 03_parse.py / 04_clean.py
+cleaned_file = os.environ.get("Cleaned_JSON", "04_cleaned_courses.jsonl")
+#cleaned_file = "cleaned_courses.jsonl"
+output_file = "05_course_titles.txt"
 
-# Extract course titles
-course_titles = [course["title"] for course in cleaned_courses if "title" in course]
+def run(datasets=None):
+    """Pipeline entry point: extracts and saves the course titles, returning {"course_titles": [...]}."""
+    cleaned_courses = (datasets or {}).get("cleaned_courses")
+    if cleaned_courses is None:
+        cleaned_courses = read_records("output_folder/"+cleaned_file)
 
-# Save extracted course titles to a text file
-output_file = "05_course_titles.txt"
-with open('output_folder/'+output_file, "w", encoding="utf-8") as file:
-    for title in course_titles:
-        file.write(title + "\n")
-os.environ['Output_TXT'] = output_file
-print(f"Course titles extracted and saved to {output_file}")
+    # Extract course titles
+    course_titles = [course["title"] for course in cleaned_courses if "title" in course]
+
+    # Save extracted course titles to a text file
+    with open('output_folder/'+output_file, "w", encoding="utf-8") as file:
+        for title in course_titles:
+            file.write(title + "\n")
+    print(f"Course titles extracted and saved to {output_file}")
+    return {"course_titles": course_titles}
+
+if __name__ == "__main__":
+    run()
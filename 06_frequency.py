@@ -7,49 +7,100 @@
 #  Tools/Resources: You can use a “map reduce” 
 #  style word counting approach.
 # -----------------------------------------------
-import re
 import os
-import pandas as pd
-from collections import Counter
-from nltk.corpus import stopwords
-import nltk
-
-# Ensure stopwords are downloaded
-#nltk.download('stopwords')
+from stopwords import load_stopwords
+from textcount import count_ngrams, count_tokens
 
 # Load the course titles from the text file
 course_titles_file = os.environ.get("Output_TXT", "05_course_titles.txt")
 #course_titles_file = "course_titles.txt"  # Update the path as needed
+cleaned_courses_file = "04_cleaned_courses.jsonl"  # Course descriptions, for --fields descriptions
+output_csv_file = "06_word_frequencies.csv"
+ngram_csv_file = "06_{field}_{n}gram_frequencies.csv"  # Every other field and n-gram size
+FIELDS = ("titles", "descriptions")
 
-with open("output_folder/"+course_titles_file, "r", encoding="utf-8") as file:
-    course_titles = file.readlines()
+def load_texts(field, datasets=None):
+    """The course titles or descriptions, from the pipeline's datasets or the earlier stages' files."""
+    datasets = datasets or {}
+    if field == "titles":
+        course_titles = datasets.get("course_titles")
+        if course_titles is None:
+            with open("output_folder/"+course_titles_file, "r", encoding="utf-8") as file:
+                course_titles = file.readlines()
+        return course_titles
+    courses = datasets.get("cleaned_courses")
+    if courses is None:
+        from records import read_records
+        courses = read_records("output_folder/"+cleaned_courses_file)
+    return [course.get("description") or "" for course in courses]
 
-# Use NLTK stopwords for a more comprehensive list
-stop_words = set(stopwords.words("english"))
+def run(datasets=None, fields=("titles",), ngrams=(1,), workers=1, engine="vectorized", min_count=1,
+        use_store=True):
+    """
+    Pipeline entry point: counts words (and n-grams) in course titles (and
+    descriptions), saves the CSVs and returns {"word_frequencies": DataFrame,
+    "ngram_frequencies": {(field, n): DataFrame}}.
+    """
+    import pandas as pd
 
-# Preprocessing: Convert to lowercase, remove punctuation, and split into words
-word_list = []
-for title in course_titles:
-    words = re.findall(r"\b[a-zA-Z]+\b", title.lower())  # Extract words
-    words = [word for word in words if word not in stop_words]  # Remove stopwords
-    word_list.extend(words)
+    # NLTK's English stopword list, shipped in data/stopwords
+    stop_words = load_stopwords("english")
 
-# Perform word frequency count using a MapReduce-style approach
-word_counts = Counter(word_list)
+    # Preprocessing: lowercase, words of letters only, stopwords removed.
+    # The tokens are kept in a shared store (see token_store.py) and only
+    # tokenized again when the texts change (use_store=False tokenizes afresh
+    # and keeps nothing).
+    # Counting: MapReduce-style, chunks counted in `workers` processes and
+    # merged pairwise (see textcount.py), sorted by frequency
+    tables = {}
+    for field in fields:
+        texts = load_texts(field, datasets)
+        if engine == "python":
+            counts = count_ngrams(texts, ngrams, stop_words, engine=engine, workers=workers, min_count=min_count)
+        else:
+            from token_store import TokenStore, open_store
+            if use_store:
+                store = open_store("bu_" + field, texts, workers=workers)
+            else:
+                store = TokenStore.build(texts, workers)
+            counts = count_tokens(store, ngrams, stop_words, workers=workers, min_count=min_count)
+        for n in ngrams:
+            tables[(field, n)] = counts[n]
 
-# Convert to a sorted list of tuples (word, count) ordered by frequency
-sorted_word_counts = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)
+    # Save results to CSV files: title words to the file the later stages read
+    df_word_freq = None
+    ngram_frequencies = {}
+    for (field, n), sorted_counts in tables.items():
+        if (field, n) == ("titles", 1):
+            df_word_freq = pd.DataFrame(sorted_counts, columns=["Word", "Frequency"])
+            df_word_freq.to_csv('output_folder/'+output_csv_file, index=False)
+            print(f"- CSV saved as: {output_csv_file}")
+            continue
+        csv_file = ngram_csv_file.format(field=field, n=n)
+        ngram_frequencies[(field, n)] = pd.DataFrame(sorted_counts, columns=["Ngram", "Frequency"])
+        ngram_frequencies[(field, n)].to_csv('output_folder/'+csv_file, index=False)
+        print(f"- CSV saved as: {csv_file} ({len(sorted_counts)} distinct {n}-grams)")
 
-# Save results to a CSV file
-output_csv_file = "06_word_frequencies.csv"
-df_word_freq = pd.DataFrame(sorted_word_counts, columns=["Word", "Frequency"])
-df_word_freq.to_csv('output_folder/'+output_csv_file, index=False)
+    print(f"\nWord frequency analysis complete.")
+    return {"word_frequencies": df_word_freq, "ngram_frequencies": ngram_frequencies}
+
+if __name__ == "__main__":
+    import argparse
 
-# Display top 10 most common words
-""" print("\nTop 10 Most Common Words in Course Titles:")
-for word, count in sorted_word_counts[:10]:
-    print(f"{word}: {count}") """
+    parser = argparse.ArgumentParser(description="Count words and n-grams in course titles and descriptions.")
+    parser.add_argument("--fields", nargs="+", choices=FIELDS, default=["titles"],
+                        help=f"Texts to count (title words always go to {output_csv_file})")
+    parser.add_argument("--ngrams", nargs="+", type=int, choices=[1, 2, 3], default=[1],
+                        help="N-gram sizes to count, e.g. --ngrams 1 2 3")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Counting processes (0 = one per CPU core)")
+    parser.add_argument("--engine", choices=["vectorized", "python"], default="vectorized",
+                        help="vectorized (token store and numpy) or python (Counters of strings)")
+    parser.add_argument("--min-count", type=int, default=1,
+                        help="Leave out n-grams seen fewer times than this")
+    parser.add_argument("--no-store", action="store_true",
+                        help="Tokenize the texts even if a stored copy of their tokens is current")
+    args = parser.parse_args()
 
-os.environ['WordFreq'] = output_csv_file
-print(f"\nWord frequency analysis complete.")
-print(f"- CSV saved as: {output_csv_file}")
+    run(fields=args.fields, ngrams=args.ngrams, workers=args.workers or os.cpu_count() or 1,
+        engine=args.engine, min_count=args.min_count, use_store=not args.no_store)
@@ -10,72 +10,67 @@
 #     Chart.JS, https://www.chartjs.org/
 #     Google Charts, https://developers.google.com/chart/
 # -----------------------------------------------
-import pandas as pd
-import matplotlib.pyplot as plt
 import os
-import seaborn as sns
-import subprocess
-import sys
-
-# Function to install wordcloud if not already installed
-def install_wordcloud():
-    try:
-        import wordcloud
-    except ImportError:
-        print("Installing wordcloud...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "wordcloud"])
-        import wordcloud
-
-# Install wordcloud if necessary
-install_wordcloud()
-
-from wordcloud import WordCloud
+from charts import chart, render, cache_summary
 
 # Load word frequency data
 file_path = os.environ.get("WordFreq", "06_word_frequencies.csv")
 #file_path = "word_frequencies.csv"
-df = pd.read_csv("output_folder/"+file_path)
-
-# Sort data to show the most frequent words
-df = df.sort_values(by="Frequency", ascending=False)
 
 # ----------- BAR CHART -----------
-plt.figure(figsize=(12, 6)) # Set the figure size
-#sns.barplot(x=df["Frequency"][:15], y=df["Word"][:15], palette="viridis") # Create the bar plot
-sns.barplot(x=df["Frequency"][:15], y=df["Word"][:15], hue=df["Word"][:15], palette="viridis", legend=False) # Create the bar plot
-plt.xlabel("Frequency") # Set the x-axis label
-plt.ylabel("Word") # Set the y-axis label
-plt.title("Top 15 Most Common Words in Course Titles") # Set the title
-plt.grid(axis="x", linestyle="--", alpha=0.7) # Add gridlines for better readability
-plt.show()
+def draw_bar_chart(words, counts):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    figure = plt.figure(figsize=(12, 6)) # Set the figure size
+    #sns.barplot(x=counts, y=words, palette="viridis") # Create the bar plot
+    sns.barplot(x=counts, y=words, hue=words, palette="viridis", legend=False) # Create the bar plot
+    plt.xlabel("Frequency") # Set the x-axis label
+    plt.ylabel("Word") # Set the y-axis label
+    plt.title("Top 15 Most Common Words in Course Titles") # Set the title
+    plt.grid(axis="x", linestyle="--", alpha=0.7) # Add gridlines for better readability
+    return figure
 
 # ----------- WORD CLOUD -----------
-wordcloud = WordCloud(width=800, height=400, background_color="white", colormap="viridis").generate_from_frequencies(dict(zip(df["Word"], df["Frequency"])))
+def draw_wordcloud(frequencies, width=800, height=400, colormap="viridis", max_words=200):
+    import matplotlib.pyplot as plt
+    from wordcloud import WordCloud
+
+    wordcloud = WordCloud(width=width, height=height, background_color="white", colormap=colormap,
+                          max_words=max_words).generate_from_frequencies(frequencies)
+
+    figure = plt.figure(figsize=(12, 6))
+    plt.imshow(wordcloud, interpolation="bilinear")
+    plt.axis("off")  # Hide axes
+    plt.title("Word Cloud of Most Common Words in Course Titles")
+    return figure
+
+def run(datasets=None, show=False):
+    """Pipeline entry point: draws and saves the word frequency charts from 06's table."""
+    import pandas as pd
+
+    df = (datasets or {}).get("word_frequencies")
+    if df is None:
+        df = pd.read_csv("output_folder/"+file_path)
 
-plt.figure(figsize=(12, 6))
-plt.imshow(wordcloud, interpolation="bilinear")
-plt.axis("off")  # Hide axes
-plt.title("Word Cloud of Most Common Words in Course Titles")
-plt.show()
+    # Sort data to show the most frequent words
+    df = df.sort_values(by="Frequency", ascending=False)
 
-#---------------------SAVE VISUALIZATIONS---------------------
-# Save bar chart
-plt.figure(figsize=(12, 6))
-#sns.barplot(x=df["Frequency"][:15], y=df["Word"][:15], palette="viridis")
-sns.barplot(x=df["Frequency"][:15], y=df["Word"][:15], hue=df["Word"][:15], palette="viridis", legend=False)
-plt.xlabel("Frequency")
-plt.ylabel("Word")
-plt.title("Top 15 Most Common Words in Course Titles")
-plt.grid(axis="x", linestyle="--", alpha=0.7)
-plt.savefig("output_folder/07_word_freq_bar_chart.png")  # Save instead of showing
-plt.close()  # Close figure to prevent overlap
+    #---------------------SAVE VISUALIZATIONS---------------------
+    # Each chart is built once and saved once (see charts.py), the two in parallel
+    rendered = render([
+        chart(draw_bar_chart, "output_folder/07_word_freq_bar_chart.png",
+              words=df["Word"][:15].tolist(), counts=df["Frequency"][:15].tolist()),
+        chart(draw_wordcloud, "output_folder/07_wordcloud_freq.png",
+              frequencies=dict(zip(df["Word"], df["Frequency"].tolist()))),
+    ], show=show)
+    print(cache_summary(rendered))
+    return {}
 
-# Save word cloud
-wordcloud = WordCloud(width=800, height=400, background_color="white", colormap="viridis").generate_from_frequencies(dict(zip(df["Word"], df["Frequency"])))
+if __name__ == "__main__":
+    import argparse
 
-plt.figure(figsize=(12, 6))
-plt.imshow(wordcloud, interpolation="bilinear")
-plt.axis("off")
-plt.title("Word Cloud of Most Common Words in Course Titles")
-plt.savefig("output_folder/07_wordcloud_freq.png")  # Save instead of showing
-plt.close()
+    parser = argparse.ArgumentParser(description="Draw the word frequency charts.")
+    parser.add_argument("--show", action="store_true", help="Also open the charts in windows")
+    args = parser.parse_args()
+    run(show=args.show)
@@ -18,15 +18,16 @@
 #  any assumptions or decisions made during 
 #  the data preparation process.
 # -----------------------------------------------
-import json
+import argparse
 import os
+from records import read_records, RecordWriter, write_json_array, tee_records
 
-# Load the existing cleaned courses JSON file
-input_file = os.environ.get("Cleaned_JSON", "04_cleaned_courses.json")
-#input_file = "cleaned_courses.json"  # Update this if needed
+# Same default as partitioned.DATASET_ROOT; pyarrow is only imported when columnar output is on
+DATASET_ROOT = "catalog_dataset"
 
-with open('output_folder/'+input_file, "r", encoding="utf-8") as f:
-    courses = json.load(f)
+# Stream the cleaned courses (JSON Lines) from 03_parse.py / 04_clean.py
+input_file = os.environ.get("Cleaned_JSON", "04_cleaned_courses.jsonl")
+#input_file = "cleaned_courses.jsonl"  # Update this if needed
 
 # Helper function to extract department from course code
 def extract_department(code):
@@ -35,9 +36,10 @@ def extract_department(code):
         return parts[1]  # Extracting second part as the department
     return "Unknown"
 
-# Process and refine the dataset
-processed_courses = []
-for course in courses:
+# Refine one course record (a copy: in the pipeline the input is shared with other stages)
+def refine_course(course):
+    course = dict(course)
+
     # Standardizing units field (convert "N/A" to None, ensure numeric values)
     course["units"] = None if course["units"] == "N/A" else int(course["units"])
 
@@ -57,13 +59,80 @@ for course in courses:
             unique_schedules.append(schedule)
 
     course["schedule"] = unique_schedules
+    return course
+
+
+def run(datasets=None, fmt="both", compress=False, columnar=True, year=2024, dataset_root=DATASET_ROOT,
+        keep=False):
+    """
+    Pipeline entry point: refines the cleaned courses (from memory when an
+    earlier stage produced them, otherwise from disk) and writes every
+    export. With `keep` also returns {"refined_courses": [...]}, otherwise {}.
+    """
+    if columnar:
+        from columnar import ColumnarWriter, read_courses
+        from partitioned import write_partitioned_table
+
+    courses = (datasets or {}).get("cleaned_courses")
+    if courses is None:
+        courses = read_records('output_folder/'+input_file)
+
+    # Process and refine the dataset one record at a time
+    refined = [] if keep else None
+    refined_courses = tee_records((refine_course(course) for course in courses), refined)
+
+    # Every output is fed from the same single pass over the records
+    jsonl_file = "08_refined_courses.jsonl" + (".gz" if compress else "")
+    output_file = "08_refined_courses.json"
+    parquet_file = "08_refined_courses.parquet"
+    arrow_file = "08_refined_courses.arrow"
+    writers = []
+    if fmt in ("jsonl", "both"):
+        writers.append(RecordWriter('output_folder/'+jsonl_file))
+    if columnar:
+        writers.append(ColumnarWriter('output_folder/'+parquet_file, 'output_folder/'+arrow_file))
+
+    def tee(courses):
+        for course in courses:
+            for writer in writers:
+                writer.write(course)
+            yield course
+
+    try:
+        if fmt in ("json", "both"):
+            # The indented JSON document is the human-facing final export
+            count = write_json_array(tee(refined_courses), 'output_folder/'+output_file, ensure_ascii=False)
+        else:
+            count = sum(1 for _ in tee(refined_courses))
+    finally:
+        for writer in writers:
+            writer.close()
+
+    if columnar:
+        # Partitioned from the memory-mapped Arrow copy, so the records are never all held as Python objects
+        manifest = write_partitioned_table(read_courses('output_folder/'+arrow_file), "BU", year, root=dataset_root)
+        print(f"Partitioned dataset written to {dataset_root}: {len(manifest['partitions'])} departments")
+
+    saved = [name for name, wanted in ((jsonl_file, fmt != "json"),
+                                       (output_file, fmt != "jsonl"),
+                                       (parquet_file, columnar),
+                                       (arrow_file, columnar)) if wanted]
+    print(f"Dataset exported successfully: {count} courses saved as {', '.join(saved)}")
+    return {"refined_courses": refined} if keep else {}
 
-    # Append processed course
-    processed_courses.append(course)
 
-# Save the refined dataset in JSON format
-output_file = "08_refined_courses.json"
-with open('output_folder/'+output_file, "w", encoding="utf-8") as f:
-    json.dump(processed_courses, f, indent=4, ensure_ascii=False)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the refined course catalog.")
+    parser.add_argument("--format", choices=["jsonl", "json", "both"], default="both",
+                        help="jsonl for downstream stages, json for the indented final export")
+    parser.add_argument("--compress", action="store_true", help="gzip the JSON Lines output")
+    parser.add_argument("--no-columnar", action="store_true",
+                        help="Skip the Parquet and Arrow copies of the dataset")
+    parser.add_argument("--year", type=int, default=2024,
+                        help="Catalog year the BU pages were crawled for (partition key)")
+    parser.add_argument("--dataset", default=DATASET_ROOT,
+                        help="Root of the institution/year/department partitioned dataset")
+    args = parser.parse_args()
 
-print(f"Dataset exported successfully as {output_file}")
\ No newline at end of file
+    run(fmt=args.format, compress=args.compress, columnar=not args.no_columnar,
+        year=args.year, dataset_root=args.dataset)
@@ -1,63 +1,396 @@
 # -----------------------------------------------
 #  9. Data pipeline:
-# 
-#  Write a program that automates the 
-#  sequential execution of previously created 
-#  script files, ensuring that each script 
-#  runs to completion before the next begins. 
-#  This program aims to streamline the 
-#  generation of outputs from all your 
-#  previous files, consolidating the 
+#
+#  Write a program that automates the
+#  sequential execution of previously created
+#  script files, ensuring that each script
+#  runs to completion before the next begins.
+#  This program aims to streamline the
+#  generation of outputs from all your
+#  previous files, consolidating the
 #  results into one sequence.
 # -----------------------------------------------
 # import required libraries
-import subprocess
+import os
 import sys
+import json
+import hashlib
+import argparse
+import importlib
+import traceback
+import contextlib
+import functools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from telemetry import (measure_in_process, run_measured, add_io, dataset_records, profile_in_process,
+                       profile_path, write_report, format_table)
 
-# Function to install nltk if not already installed
-def install_nltk():
-    try:
-        import nltk
-    except ImportError:
-        print("Installing nltk...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "nltk"])
-        import nltk
-
-    # Download necessary nltk data
-    nltk.download('stopwords')
-    nltk.download('punkt')
-    nltk.download('wordnet')
-
-# Install nltk if necessary
-install_nltk()
-
-# Define the sequence of scripts to run
-scripts = [
-    "01_pull.py",       # Scrapes raw HTML from the website
-    "02_combine.py",        # Merges multiple scraped files
-    "03_parse.py",        # Parses merged HTML and extracts raw course data
-    "04_clean.py",        # Cleans and standardizes the extracted data
-    "05_extract.py", # Extracts course titles specifically
-    "06_frequency.py",    # Performs word frequency analysis
-    "07_visualization.py", # Generates visualizations for the analysis
-    "08_export.py"        # Formats and exports the final dataset
+#==============================================================================
+# STAGES
+#==============================================================================
+# Every script, with the artifacts (files or folders) it reads and writes.
+# A script runs after the scripts that write its inputs, and only when its
+# code, its inputs or its outputs have changed since it last succeeded.
+# "modules" are the helper modules (and data files) a script imports, which
+# count as its code. Nothing is installed or downloaded at run time: the
+# scripts' dependencies must already be installed.
+# "after" adds ordering the artifacts do not show. No stage needs it now:
+# 12-15 read the MIT catalogs from 10_mit_1996.json / 11_mit_2024.json in
+# the project folder, which 10 and 11 write (and hand over in memory).
+# The plotting scripts (07, 12-15) hand their figures to charts.py, which
+# renders them headless in a process pool shared by every stage, so those
+# scripts can run at the same time like any others.
+#
+# By default every script runs in this process: the runner imports it and
+# calls its run(datasets), where `datasets` holds what earlier stages
+# returned ("cleaned_courses", "course_titles", "word_frequencies",
+# "refined_courses", "mit_1996", "mit_2024", ...). A stage whose input is not
+# in memory (say, because the stage producing it was up to date) reads it
+# from disk. --isolate runs each script as its own Python process instead.
+# "keep" marks a stage whose run() only holds its records in memory when
+# asked (run(datasets, keep=True)); the runner asks when a stage that reads
+# them is still to run, and otherwise the records just stream to disk.
+stages = [
+    {"script": "01_pull.py",         # Scrapes raw HTML from the website
+     "inputs": [], "modules": ["crawler.py", "crawl_manifest.py", "crawl_journal.py", "page_store.py"],
+     "outputs": ["bu_courses"]},
+    #{"script": "02_combine.py",     # Merges multiple scraped files (optional: 03 streams the pages directly)
+    # "inputs": ["bu_courses"], "outputs": ["bu_courses/merged_courses.html"]},
+    {"script": "03_parse.py",        # Parses the scraped pages one at a time into clean, typed course data
+     "inputs": ["bu_courses"], "modules": ["page_store.py", "parse_cache.py", "records.py"],
+     "outputs": ["output_folder/04_cleaned_courses.jsonl"], "keep": True},
+    #{"script": "04_clean.py",       # Cleans raw-HTML records (only needed after 03_parse.py --raw-html)
+    # "inputs": ["output_folder/03_parsed_courses.jsonl"], "outputs": ["output_folder/04_cleaned_courses.jsonl"],
+    # "keep": True},
+    {"script": "05_extract.py",      # Extracts course titles specifically
+     "inputs": ["output_folder/04_cleaned_courses.jsonl"], "modules": ["records.py"],
+     "outputs": ["output_folder/05_course_titles.txt"]},
+    {"script": "06_frequency.py",    # Performs word frequency analysis
+     "inputs": ["output_folder/05_course_titles.txt"],
+     "modules": ["stopwords.py", "data/stopwords/english.txt", "textcount.py", "token_store.py"],
+     "outputs": ["output_folder/06_word_frequencies.csv"]},
+    {"script": "07_visualization.py",  # Generates visualizations for the analysis
+     "inputs": ["output_folder/06_word_frequencies.csv"], "modules": ["charts.py"],
+     "outputs": ["output_folder/07_word_freq_bar_chart.png", "output_folder/07_wordcloud_freq.png"]},
+    {"script": "08_export.py",       # Formats and exports the final dataset
+     "inputs": ["output_folder/04_cleaned_courses.jsonl"],
+     "modules": ["records.py", "columnar.py", "partitioned.py"],
+     "outputs": ["output_folder/08_refined_courses.jsonl", "output_folder/08_refined_courses.json",
+                 "output_folder/08_refined_courses.parquet", "output_folder/08_refined_courses.arrow",
+                 "catalog_dataset/institution=BU/year=2024"]},
+    {"script": "10_extract_1996.py", # Extracts the scanned 1996 MIT catalog
+     "inputs": ["step10_catalog_1996/merged.pdf", "lookuptable.json"],
+     "modules": ["partitioned.py", "parse_cache.py"],
+     "outputs": ["10_mit_1996.json", "catalog_dataset/institution=MIT/year=1996"]},
+    {"script": "11_extract_2024.py", # Scrapes and parses the 2024 MIT catalog
+     "inputs": [], "modules": ["crawl_manifest.py", "crawl_journal.py", "partitioned.py"],
+     "outputs": ["11_mit_2024.json", "catalog_dataset/institution=MIT/year=2024"]},
+    {"script": "12_course_offerings.py",
+     "inputs": ["10_mit_1996.json", "11_mit_2024.json"], "modules": ["charts.py"],
+     "outputs": ["course_count.csv", "course_change.png"]},
+    {"script": "13_title_evolution.py",
+     "inputs": ["10_mit_1996.json", "11_mit_2024.json"],
+     "modules": ["charts.py", "stopwords.py", "data/stopwords/english.txt", "token_store.py"],
+     "outputs": ["top_words.png", "word_clouds.png", "word_frequency_changes.png"]},
+    {"script": "14_new_and_old.py",
+     "inputs": ["10_mit_1996.json", "11_mit_2024.json"], "modules": ["charts.py"],
+     "outputs": ["14_ChangeOverTime.png", "14_subj_chng_venn.png", "discontinued_subjects.json", "new_subjects.json"]},
+    {"script": "15_curriculum_breadth.py",
+     "inputs": ["10_mit_1996.json", "11_mit_2024.json"],
+     "modules": ["charts.py", "stopwords.py", "data/stopwords/english.txt", "token_store.py", "breadth.py"],
+     "outputs": ["interdisciplinary_trends.png", "15_breadth_visual.png", "wordcloud_comparison.png",
+                 "curriculum_breadth_analysis.json"]},
 ]
 
-# Function to run each script sequentially
-def run_pipeline():
-    for script in scripts:
-        print(f"\n🚀 Running {script}...")
-        # Run the script using the Python interpreter
-        result = subprocess.run([sys.executable, script], capture_output=True, text=True)
+# Hashes of what every stage last ran with, plus a stat cache so unchanged
+# files are not re-read on every run
+STATE_FILE = os.path.join(".cache", "pipeline_state.json")
+
+#==============================================================================
+# FRESHNESS
+#==============================================================================
+def file_digest(path, memo):
+    """SHA-256 of a file, reused from `memo` while its size and mtime are unchanged."""
+    stat = os.stat(path)
+    cached = memo.get(path)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    memo[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+    return memo[path][2]
+
+
+def artifact_digest(path, memo):
+    """
+    Content hash of a file, or of every file in a folder (by relative path),
+    or None if it does not exist. Hidden files such as crawl manifests and
+    journals are bookkeeping, not content, and are left out.
+    """
+    if os.path.isfile(path):
+        return file_digest(path, memo)
+    if not os.path.isdir(path):
+        return None
+    digest = hashlib.sha256()
+    for folder, subfolders, files in os.walk(path):
+        subfolders[:] = sorted(name for name in subfolders if not name.startswith("."))
+        for name in sorted(files):
+            if name.startswith("."):
+                continue
+            file_path = os.path.join(folder, name)
+            digest.update(os.path.relpath(file_path, path).encode("utf-8") + b"\0")
+            digest.update(file_digest(file_path, memo).encode("ascii"))
+    return digest.hexdigest()
+
+
+def stage_signature(stage, memo):
+    """Everything a stage's result depends on, plus what it produced."""
+    return {
+        "code": {path: file_digest(path, memo) for path in [stage["script"]] + stage.get("modules", [])},
+        "inputs": {path: artifact_digest(path, memo) for path in stage["inputs"]},
+        "outputs": {path: artifact_digest(path, memo) for path in stage["outputs"]},
+    }
+
+
+def is_fresh(stage, state, memo):
+    """True if the stage's outputs exist and nothing it depends on changed since it last succeeded."""
+    recorded = state["stages"].get(stage["script"])
+    if recorded is None:
+        return False
+    signature = stage_signature(stage, memo)
+    if any(digest is None for digest in signature["outputs"].values()):
+        return False
+    return signature == recorded
+
+
+def load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"stages": {}, "files": {}}
+
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    tmp_path = STATE_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, STATE_FILE)
+
+#==============================================================================
+# DAG
+#==============================================================================
+def build_dependencies(stages):
+    """Maps each script to the scripts that must finish before it starts."""
+    producers = {path: stage["script"] for stage in stages for path in stage["outputs"]}
+    scripts = {stage["script"] for stage in stages}
+    dependencies = {}
+    for stage in stages:
+        needs = {producers[path] for path in stage["inputs"] if path in producers}
+        needs.update(script for script in stage.get("after", []) if script in scripts)
+        needs.discard(stage["script"])
+        dependencies[stage["script"]] = needs
+
+    # Refuse to start on a cycle rather than deadlock part way
+    done = set()
+    remaining = dict(dependencies)
+    while remaining:
+        ready = [script for script, needs in remaining.items() if needs <= done]
+        if not ready:
+            sys.exit(f"❌ Dependency cycle between: {', '.join(sorted(remaining))}")
+        for script in ready:
+            done.add(script)
+            del remaining[script]
+    return dependencies
+
+
+def match_scripts(names, stages):
+    """Resolves stage names given on the command line ("03", "03_parse", "03_parse.py")."""
+    matched = []
+    for name in names:
+        found = [stage["script"] for stage in stages if stage["script"].startswith(name)]
+        if len(found) != 1:
+            sys.exit(f"❌ '{name}' matches {len(found)} stages; use more of the script name")
+        matched.append(found[0])
+    return matched
+
 
-        # Print script output for debugging
-        print(result.stdout)
-        if result.stderr:
-            print(f"❌ Error in {script}:\n{result.stderr}")
-            sys.exit(1)  # Stop the pipeline if any script fails
+def downstream(scripts, dependencies):
+    """The given scripts and every script that depends on them, directly or not."""
+    selected = set(scripts)
+    changed = True
+    while changed:
+        changed = False
+        for script, needs in dependencies.items():
+            if script not in selected and needs & selected:
+                selected.add(script)
+                changed = True
+    return selected
 
-    print("\n✅ Data pipeline completed successfully!")
+#==============================================================================
+# RUNNING
+#==============================================================================
+# Function to run one script to completion in its own Python process
+def run_script(stage, datasets, profile=False, keep=False):
+    script = stage["script"]
+    metrics = {"mode": "subprocess"}
+    # Run the script using the Python interpreter
+    result = run_measured(script, metrics, profile_path(script) if profile else None)
+
+    # Print script output for debugging
+    print(f"\n📄 {script} ({metrics['wall_s']:.1f}s)\n{result.stdout}")
+    if result.returncode != 0:
+        print(f"❌ Error in {script}:\n{result.stderr}")
+        return False, {}, metrics
+    if result.stderr:
+        print(f"⚠️  {script} wrote to stderr:\n{result.stderr}")
+    return True, {}, metrics
+
+
+def load_stage(script):
+    """Imports a stage script as a module ("03_parse.py" -> module 03_parse)."""
+    return importlib.import_module(os.path.splitext(script)[0])
+
+
+# Function to run one script's run() in this process, handing it the datasets
+# earlier stages left in memory (and asking it to keep its records for later ones)
+def run_in_process(stage, datasets, profile=False, keep=False, shared=False):
+    script = stage["script"]
+    metrics = {"mode": "in-process"}
+    ok = True
+    produced = {}
+    try:
+        module = load_stage(script)
+        with measure_in_process(metrics, shared=shared):
+            with profile_in_process(script, metrics) if profile else contextlib.nullcontext():
+                produced = (module.run(datasets, keep=True) if keep else module.run(datasets)) or {}
+    except SystemExit as e:  # Scripts bail out with sys.exit() on bad input
+        ok = e.code in (None, 0)
+    except Exception:
+        traceback.print_exc()
+        ok = False
+
+    if ok:
+        print(f"📄 {script} done ({metrics.get('wall_s', 0):.1f}s)")
+    else:
+        print(f"❌ Error in {script}")
+    return ok, produced, metrics
+
+
+# Function to run every selected script once the scripts it depends on are done
+def run_pipeline(selected, forced, jobs, dry_run=False, isolate=False, profile=False):
+    by_script = {stage["script"]: stage for stage in stages}
+    dependencies = build_dependencies(stages)
+    state = load_state()
+    memo = state["files"]
+
+    pending = [stage["script"] for stage in stages if stage["script"] in selected]
+    finished = set()   # Done (run or skipped) this time, so dependents may start
+    running = {}
+    failed = []
+    ran = 0
+    would_run = set()
+    datasets = {}      # Datasets returned by stages that ran in this process, by name
+    report = {}        # Telemetry of every stage that ran, by script
+    known_records = {}  # Record counts of artifacts whose datasets came back in memory, by path
+    if profile and jobs > 1 and not isolate:
+        # cProfile is per process (and one at a time), so concurrent stages are profiled in their own
+        print("--profile with more than one job: running each stage in its own process")
+        isolate = True
+    # Stages sharing this process with others get process-wide memory and worker CPU numbers
+    run_stage = run_script if isolate else functools.partial(run_in_process, shared=jobs > 1)
+    if not isolate:
+        os.environ.setdefault("MPLBACKEND", "Agg")  # No windows, whatever a stage draws
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            # Start every pending script whose selected dependencies are finished
+            for script in list(pending):
+                if failed:
+                    break
+                if not all(need in finished for need in dependencies[script] if need in selected):
+                    continue
+                pending.remove(script)
+                stage = by_script[script]
+                # In a dry run nothing upstream actually changes, so anything after a stage that would run, would run too
+                upstream_would_run = dry_run and dependencies[script] & would_run
+                if script not in forced and not upstream_would_run and is_fresh(stage, state, memo):
+                    print(f"⏭️  {script} is up to date")
+                    finished.add(script)
+                    continue
+                if dry_run:
+                    print(f"🚀 Would run {script}")
+                    finished.add(script)
+                    would_run.add(script)
+                    ran += 1
+                    continue
+                print(f"\n🚀 Running {script}...")
+                # Keep the records in memory only if a stage reading them is still to run
+                keep = stage.get("keep", False) and any(script in dependencies[other] for other in pending)
+                running[pool.submit(run_stage, stage, datasets, profile, keep)] = script
+
+            if not running:
+                if pending and not failed:
+                    continue  # Skipped scripts just unblocked more work
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                script = running.pop(future)
+                ok, produced, metrics = future.result()
+                stage = by_script[script]
+                records = dataset_records(produced)
+                if ok and records is not None:
+                    known_records.update(dict.fromkeys(stage["outputs"], records))
+                report[script] = add_io(dict(metrics, ok=ok), stage["inputs"], stage["outputs"], known_records)
+                if not ok:
+                    failed.append(script)  # Stop starting scripts; let running ones finish
+                    continue
+                datasets.update(produced)
+                state["stages"][script] = stage_signature(by_script[script], memo)
+                save_state(state)
+                finished.add(script)
+                ran += 1
+
+    save_state(state)
+    if report:
+        report_path = write_report(report, isolate=isolate, jobs=jobs, profile=profile)
+        print("\n" + format_table(report))
+        print(f"Run report saved to {report_path}")
+    if failed:
+        sys.exit(1)  # Stop the pipeline if any script fails
+    if dry_run:
+        print(f"\n{ran} of {len(selected)} stages would run")
+        return
+    print(f"\n✅ Data pipeline completed successfully! ({ran} ran, {len(selected) - ran} up to date)")
 
 # Run the pipeline
 if __name__ == "__main__":
-    run_pipeline()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the catalog pipeline, skipping up-to-date stages.")
+    parser.add_argument("--only", nargs="+", metavar="STAGE",
+                        help="Run just these stages (if out of date)")
+    parser.add_argument("--from", dest="from_stages", nargs="+", metavar="STAGE",
+                        help="Rerun these stages and everything downstream of them")
+    parser.add_argument("--force", action="store_true", help="Run the selected stages even if up to date")
+    parser.add_argument("--jobs", type=int, default=4, help="Stages to run at the same time")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would run without running it")
+    parser.add_argument("--isolate", action="store_true",
+                        help="Run each stage as its own Python process instead of in this one")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile every stage that runs (cProfile + flamegraph stacks in .cache/profiles); "
+                             "with more than one job each stage then runs in its own process")
+    args = parser.parse_args()
+
+    dependencies = build_dependencies(stages)
+    selected = {stage["script"] for stage in stages}
+    forced = set()
+    if args.only:
+        selected = set(match_scripts(args.only, stages))
+    if args.from_stages:
+        forced = downstream(match_scripts(args.from_stages, stages), dependencies)
+        selected = selected & forced if args.only else forced
+    if args.force:
+        forced = set(selected)
+
+    run_pipeline(selected, forced, max(1, args.jobs), args.dry_run, args.isolate, args.profile)
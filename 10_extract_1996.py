@@ -30,149 +30,321 @@ import os
 import re
 import json
 import sys
-import fitz  # PyMuPDF
+import hashlib
+from parse_cache import ParseCache
 
 # Folder where the merged PDF is stored.
 input_folder = "step10_catalog_1996"
-if not os.path.exists(input_folder):
-    os.makedirs(input_folder)
-    print(f"Created folder: {input_folder}")
-else:
-    print(f"Folder exists: {input_folder}")
 
-# Input PDF file (merged.pdf) and output JSON file path.
+# Input PDF file (merged.pdf) and output JSON file path (in the project
+# folder, where 12-15 read the catalog from).
 pdf_file = os.path.join(input_folder, "merged.pdf")
-output_json = os.path.join(input_folder, "10_mit_1996H.json")
+output_json = "10_mit_1996.json"
 
-if not os.path.exists(pdf_file):
-    print(f"Error: PDF file '{pdf_file}' not found.")
-    sys.exit(1)
-
-# Load the lookup table that maps course prefix -> department name.
+# The lookup table that maps course prefix -> department name.
 lookup_file = "lookuptable.json"  # Adjust path if needed
-if not os.path.exists(lookup_file):
-    print(f"Error: Lookup table file '{lookup_file}' not found.")
-    sys.exit(1)
-
-with open(lookup_file, "r", encoding="utf-8") as f:
-    department_lookup_data = json.load(f)
-
-# Convert lookup data into a dictionary for quick access.
-department_map = {}
-for item in department_lookup_data:
-    course_number = item["Course Number"].strip()
-    department_title = item["Course Title"].strip()
-    # Store it in a dictionary, key = "21W", value = "Program in Writing..."
-    department_map[course_number.upper()] = department_title
-
-def extract_text(pdf_path):
-    """
-    Extracts text from the PDF using PyMuPDF.
-    Returns the full extracted text as a string.
-    """
+
+# Pages per extraction task when extracting with several workers.
+PAGES_PER_RANGE = 16
+
+# Extraction settings. Cached page text is keyed by these, the PyMuPDF
+# version and the PDF's content hash; bump the version when extraction changes.
+TEXT_MODE = "text"
+EXTRACT_VERSION = "10-pages-1"
+
+def load_department_map(lookup_file):
+    """Reads the lookup table into a {"21W": "Program in Writing...", ...} dictionary."""
+    if not os.path.exists(lookup_file):
+        print(f"Error: Lookup table file '{lookup_file}' not found.")
+        sys.exit(1)
+
+    with open(lookup_file, "r", encoding="utf-8") as f:
+        department_lookup_data = json.load(f)
+
+    # Convert lookup data into a dictionary for quick access.
+    department_map = {}
+    for item in department_lookup_data:
+        course_number = item["Course Number"].strip()
+        department_title = item["Course Title"].strip()
+        # Store it in a dictionary, key = "21W", value = "Program in Writing..."
+        department_map[course_number.upper()] = department_title
+    return department_map
+
+def _open_pdf(pdf_path):
+    import fitz  # PyMuPDF
+
     try:
-        doc = fitz.open(pdf_path)
+        return fitz.open(pdf_path)
     except Exception as e:
         print(f"Error opening PDF '{pdf_path}': {e}")
         sys.exit(1)
-    
-    full_text = ""
-    for page_num, page in enumerate(doc, start=1):
-        page_text = page.get_text("text")
+
+def extract_page_range(pdf_path, start, stop):
+    """Text of pages start..stop-1 (0-based), from a document handle of its own."""
+    doc = _open_pdf(pdf_path)
+    try:
+        return [doc[page_index].get_text(TEXT_MODE) for page_index in range(start, stop)]
+    finally:
+        doc.close()
+
+def iter_page_texts(pdf_path, workers=1, pages_per_range=PAGES_PER_RANGE, start=0):
+    """
+    Yields (page number, page text) for every page of the PDF from page
+    index `start` on, in order.
+    With several workers the document is split into ranges of
+    `pages_per_range` pages, extracted in a process pool (each worker opens
+    its own handle). At most two ranges per worker are in flight, so memory
+    stays proportional to a few ranges, not the whole book.
+    """
+    if workers <= 1:
+        doc = _open_pdf(pdf_path)
+        try:
+            for page_index in range(start, doc.page_count):
+                yield page_index + 1, doc[page_index].get_text(TEXT_MODE)
+        finally:
+            doc.close()
+        return
+
+    from itertools import islice
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    doc = _open_pdf(pdf_path)
+    page_count = doc.page_count
+    doc.close()
+    starts = iter(range(start, page_count, pages_per_range))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def submit(start):
+            stop = min(start + pages_per_range, page_count)
+            return start, pool.submit(extract_page_range, pdf_path, start, stop)
+
+        pending = deque(submit(start) for start in islice(starts, 2 * workers))
+        while pending:
+            start, future = pending.popleft()
+            texts = future.result()  # Ranges come back in document order
+            pending.extend(submit(next_start) for next_start in islice(starts, 1))  # Keep the pool busy
+            for page_num, page_text in enumerate(texts, start=start + 1):
+                yield page_num, page_text
+
+def _extract_settings():
+    from importlib.metadata import version, PackageNotFoundError
+
+    try:
+        pymupdf_version = version("PyMuPDF")
+    except PackageNotFoundError:
+        pymupdf_version = "unknown"
+    return f"{EXTRACT_VERSION}:{TEXT_MODE}:pymupdf-{pymupdf_version}"
+
+def pdf_hash(pdf_path, cache):
+    """SHA-256 of the PDF's bytes, remembered in `cache` for as long as its size and mtime stay the same."""
+    stat = os.stat(pdf_path)
+    key = cache.key(f"file:{os.path.abspath(pdf_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    digest = cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(pdf_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        cache.put(key, digest)
+    return digest
+
+def iter_cached_page_texts(pdf_path, cache, workers=1):
+    """
+    iter_page_texts(), served from `cache` (a ParseCache) where possible.
+    Page text is keyed by the PDF's content hash, the page number and the
+    extraction settings, so a changed PDF or extraction mode is extracted
+    afresh. From the first page not in the cache on, pages are extracted
+    and stored.
+    """
+    document = pdf_hash(pdf_path, cache)
+
+    def page_key(page_num):
+        return cache.key(f"{document}:{page_num}".encode("utf-8"))
+
+    page_count = cache.get(page_key("count"))
+    page_index = 0
+    while page_count is not None and page_index < page_count:
+        page_text = cache.get(page_key(page_index + 1))
+        if page_text is None:
+            break
+        page_index += 1
+        yield page_index, page_text
+    if page_count is not None and page_index == page_count:
+        return  # Every page came from the cache; PyMuPDF was never imported
+
+    for page_num, page_text in iter_page_texts(pdf_path, workers, start=page_index):
+        cache.put(page_key(page_num), page_text)
+        page_index = page_num
+        yield page_num, page_text
+    cache.put(page_key("count"), page_index)
+
+def iter_text(pdf_path, workers=1, cache=None):
+    """
+    Text of the PDF using PyMuPDF, page by page (each with a trailing
+    newline), extracted in `workers` processes and taken from `cache` for
+    pages extracted before with the same settings.
+    """
+    if cache is not None:
+        pages = iter_cached_page_texts(pdf_path, cache, workers)
+    else:
+        pages = iter_page_texts(pdf_path, workers)
+    for page_num, page_text in pages:
         if not page_text.strip():
             print(f"Warning: No text extracted from page {page_num} of {pdf_path}")
-        full_text += page_text + "\n"
-    doc.close()
-    return full_text
+        yield page_text + "\n"
 
-def parse_courses(text):
+def extract_text(pdf_path, workers=1, cache=None):
     """
-    Splits the text into course blocks and extracts course data.
-    Handles course headers that span multiple lines.
-    
-    For each block, the first line (plus any subsequent short lines)
-    is merged into a header. Then, the header is trimmed so that any text
-    starting with an open bracket "(" or the word "Prereq" (case-insensitive)
-    is removed. This ensures that no bracket appears in the course title.
+    Extracts text from the PDF using PyMuPDF (see iter_text).
+    Returns the full extracted text as a string.
     """
-    # Split text into blocks where each block begins with a course code.
-    # This pattern now supports alphanumeric prefixes (e.g., 21W, 21h),
-    # a dot, then alphanumeric again, optionally with a dash for ranges.
-    blocks = re.split(r"(?=^[A-Za-z0-9]+\.[A-Za-z0-9]+(?:-[A-Za-z0-9]+\.[A-Za-z0-9]+)?\s)", 
-                      text, flags=re.MULTILINE)
-    courses = []
-    for block in blocks:
-        block = block.strip()
-        if not block:
-            continue
-        lines = block.splitlines()
-        if not lines:
-            continue
-
-        # Start with the first line as the header.
-        header_line = lines[0].strip()
-        description_lines = lines[1:]
-        
-        # Merge subsequent lines if they are short (<=10 words) and do not start with "Prereq.:"
-        i = 0
-        while i < len(description_lines):
-            curr_line = description_lines[i].strip()
-            if curr_line.startswith("Prereq.:") or len(curr_line.split()) > 10:
-                break
-            header_line += " " + curr_line
-            i += 1
-        # The remaining lines are the description.
-        description_lines = description_lines[i:]
-        
-        # Trim header_line at the first occurrence of "(" or "Prereq"
-        header_line_clean = re.split(r"\(|Prereq", header_line, flags=re.IGNORECASE)[0].strip()
-        
-        # Updated regex to capture alphanumeric course codes like 21w.794, 21h.101, 18.01A, etc.
-        header_match = re.match(
-            r"^(?P<code>[A-Za-z0-9]+\.[A-Za-z0-9]+(?:-[A-Za-z0-9]+\.[A-Za-z0-9]+)?)\s+(?P<title>.+)$",
-            header_line_clean
-        )
-        if not header_match:
-            continue
-        course_code = header_match.group("code").strip()
-        title = header_match.group("title").strip()
-        
-        # Determine department by extracting everything before the first dot in course_code
-        # E.g., from "21W.794" -> "21W"
-        dept_key = re.match(r"^[^.]+", course_code)
-        department_name = "Unknown"
-        if dept_key:
-            dept_key_str = dept_key.group(0).upper()
-            department_name = department_map.get(dept_key_str, "Unknown")
-
-        # Look for a line that contains "Prereq.:"
-        prereq = "None"
-        for line in description_lines:
-            prereq_match = re.search(r"Prereq\.:\s*(.*)", line)
-            if prereq_match:
-                prereq = prereq_match.group(1).strip()
-                break
-        
-        # Build the description by joining all lines (excluding any "Prereq.:" line).
-        desc_lines = [line for line in description_lines if not line.startswith("Prereq.:")]
-        description = " ".join(desc_lines).strip()
-        description = re.sub(r"\s+", " ", description)
-        
-        courses.append({
-            "course_code": course_code,
-            "department": department_name,
-            "title": title,
-            "prerequisites": prereq,
-            "description": description
-        })
-    return courses
-
-def main():
-    # Step 1: Extract raw text from the merged PDF.
-    raw_text = extract_text(pdf_file)
-    
-    # Step 2: Parse the text to extract course data.
-    courses = parse_courses(raw_text)
+    return "".join(iter_text(pdf_path, workers, cache))  # One copy at the end instead of one per page
+
+# Course block patterns, compiled once.
+# A block begins at a line starting with a course code followed by whitespace.
+# Codes may have alphanumeric prefixes (e.g., 21W, 21h), a dot, then
+# alphanumeric again, optionally with a dash for ranges.
+CODE = r"[A-Za-z0-9]+\.[A-Za-z0-9]+(?:-[A-Za-z0-9]+\.[A-Za-z0-9]+)?"
+BLOCK_START_RE = re.compile(CODE + r"\s")
+HEADER_END_RE = re.compile(r"\(|Prereq", re.IGNORECASE)
+HEADER_RE = re.compile(r"^(?P<code>" + CODE + r")\s+(?P<title>.+)$")
+DEPT_KEY_RE = re.compile(r"^[^.]+")
+PREREQ_RE = re.compile(r"Prereq\.:\s*(.*)")
+WHITESPACE_RE = re.compile(r"\s+")
+
+def iter_lines(chunks):
+    """Lines (each with its "\n") of text arriving in chunks, such as pages; lines may span chunks."""
+    partial = ""
+    for chunk in chunks:
+        lines = (partial + chunk).split("\n")
+        partial = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if partial:
+        yield partial
+
+def iter_blocks(chunks):
+    """Course blocks of text arriving in chunks: a new block starts at each course code line, on any page."""
+    block = []
+    for line in iter_lines(chunks):
+        if BLOCK_START_RE.match(line) and block:
+            yield "".join(block)
+            block = []
+        block.append(line)
+    if block:
+        yield "".join(block)
+
+def parse_block(block, department_map):
+    """
+    Extracts one course from a course block, or returns None.
+
+    The first line (plus any subsequent short lines) is merged into a
+    header. Then, the header is trimmed so that any text starting with an
+    open bracket "(" or the word "Prereq" (case-insensitive) is removed.
+    This ensures that no bracket appears in the course title.
+    """
+    block = block.strip()
+    if not block:
+        return None
+    lines = block.splitlines()
+    if not lines:
+        return None
+
+    # Start with the first line as the header.
+    header_line = lines[0].strip()
+    description_lines = lines[1:]
+
+    # Merge subsequent lines if they are short (<=10 words) and do not start with "Prereq.:"
+    i = 0
+    while i < len(description_lines):
+        curr_line = description_lines[i].strip()
+        if curr_line.startswith("Prereq.:") or len(curr_line.split()) > 10:
+            break
+        header_line += " " + curr_line
+        i += 1
+    # The remaining lines are the description.
+    description_lines = description_lines[i:]
+
+    # Trim header_line at the first occurrence of "(" or "Prereq"
+    header_line_clean = HEADER_END_RE.split(header_line, maxsplit=1)[0].strip()
+
+    # Capture alphanumeric course codes like 21w.794, 21h.101, 18.01A, etc.
+    header_match = HEADER_RE.match(header_line_clean)
+    if not header_match:
+        return None
+    course_code = header_match.group("code").strip()
+    title = header_match.group("title").strip()
+
+    # Determine department by extracting everything before the first dot in course_code
+    # E.g., from "21W.794" -> "21W"
+    dept_key = DEPT_KEY_RE.match(course_code)
+    department_name = "Unknown"
+    if dept_key:
+        dept_key_str = dept_key.group(0).upper()
+        department_name = department_map.get(dept_key_str, "Unknown")
+
+    # Look for a line that contains "Prereq.:"
+    prereq = "None"
+    for line in description_lines:
+        prereq_match = PREREQ_RE.search(line)
+        if prereq_match:
+            prereq = prereq_match.group(1).strip()
+            break
+
+    # Build the description by joining all lines (excluding any "Prereq.:" line).
+    desc_lines = [line for line in description_lines if not line.startswith("Prereq.:")]
+    description = " ".join(desc_lines).strip()
+    description = WHITESPACE_RE.sub(" ", description)
+
+    return {
+        "course_code": course_code,
+        "department": department_name,
+        "title": title,
+        "prerequisites": prereq,
+        "description": description
+    }
+
+def iter_courses(chunks, department_map):
+    """
+    Yields courses from catalog text arriving in chunks (e.g. one per page),
+    as soon as each course block ends. Only the current block is held in
+    memory, so catalogs of any size or number of volumes stream through.
+    """
+    for block in iter_blocks(chunks):
+        course = parse_block(block, department_map)
+        if course is not None:
+            yield course
+
+def parse_courses(text, department_map):
+    """Splits the whole catalog text into course blocks and extracts course data."""
+    return list(iter_courses([text], department_map))
+
+def run(datasets=None, workers=1, use_cache=True):
+    """
+    Pipeline entry point: extracts (in `workers` processes, reusing cached
+    page text) and saves the 1996 catalog, returning {"mit_1996": [...]}.
+    """
+    if not os.path.exists(input_folder):
+        os.makedirs(input_folder)
+        print(f"Created folder: {input_folder}")
+    else:
+        print(f"Folder exists: {input_folder}")
+
+    if not os.path.exists(pdf_file):
+        print(f"Error: PDF file '{pdf_file}' not found.")
+        sys.exit(1)
+    department_map = load_department_map(lookup_file)
+
+    # Step 1: Extract raw text from the merged PDF page by page, or reuse the text of an unchanged PDF.
+    cache = ParseCache(version=_extract_settings()) if use_cache else None
+    pages = iter_text(pdf_file, workers, cache)
+
+    # Step 2: Parse the text to extract course data, course by course as the pages arrive.
+    courses = list(iter_courses(pages, department_map))
+    if cache is not None:
+        cache.close()
+        print(cache.summary())
     if not courses:
         print("No courses found. Please check the PDF extraction or adjust the parsing rules.")
         sys.exit(1)
@@ -184,5 +356,19 @@ def main():
     print(f"✅ Extracted {len(courses)} courses from '{pdf_file}'.")
     print(f"Course data (with department) saved to '{output_json}'.")
 
+    # Step 4: Add the catalog to the institution/year/department partitioned dataset.
+    from partitioned import write_partitioned
+    manifest = write_partitioned(courses, "MIT", 1996)
+    print(f"Partitioned dataset updated: {len(manifest['partitions'])} MIT 1996 departments.")
+    return {"mit_1996": courses}
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract course data from the scanned 1996 MIT catalog.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help=f"PDF extraction processes, {PAGES_PER_RANGE} pages per task (0 = one per CPU core)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Extract every page even if the same PDF was extracted before")
+    args = parser.parse_args()
+    run(workers=args.workers or os.cpu_count() or 1, use_cache=not args.no_cache)
@@ -6,7 +6,7 @@
 #  text, create a data model and save the 
 #  processed data.
 # -----------------------------------------------
-import requests
+import argparse
 from bs4 import BeautifulSoup
 import os
 import string
@@ -14,17 +14,18 @@ import time
 import glob
 import json
 import re
+from crawl_manifest import CrawlManifest, MANIFEST_NAME, CHANGES_NAME, read_changes
+from crawl_journal import CrawlJournal, JOURNAL_NAME
 
 # Base URL for MIT catalog
 INDEX_URL = "https://student.mit.edu/catalog/index.cgi"
 BASE_URL = "https://student.mit.edu/catalog/"
 OUTPUT_DIR = "mit_course_pages4"
 
-# Create directory to store downloaded HTML pages
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
 def get_department_links():
     """Scrape the index page to get all department primary links."""
+    import requests
+
     response = requests.get(INDEX_URL)
     if response.status_code != 200:
         raise Exception("Failed to fetch the index page")
@@ -39,20 +40,46 @@ def get_department_links():
     
     return department_links
 
-def download_course_pages(department):
-    """Download all course pages for a given department by iterating through tabs."""
+def download_course_pages(department, manifest, journal):
+    """
+    Download all course pages for a given department by iterating through tabs.
+    Pages the manifest shows as unchanged are not downloaded or rewritten, and
+    tabs the journal already has as done are skipped without a request.
+    """
+    import requests
+
     tab_suffix = list(string.ascii_lowercase)  # 'a' to 'z'
     tab_index = 0
     
     while True:
         page_url = f"{BASE_URL}{department}{tab_suffix[tab_index]}.html"
-        response = requests.get(page_url)
+        if page_url in journal.done:
+            tab_index += 1  # Finished before an earlier run stopped
+            continue
+
+        try:
+            response = requests.get(page_url, headers=manifest.conditional_headers(page_url))
+        except requests.RequestException as e:
+            # Leave the department unfinished so a resume or --retry-failed picks it up again here
+            print(f"Failed to fetch {page_url}: {e}")
+            journal.record_failed(page_url, e)
+            journal.record_failed(f"{BASE_URL}{department}", f"stopped at {page_url}")
+            return
         
-        if response.status_code == 200:
+        if response.status_code == 304:
+            manifest.not_modified(page_url)
+            print(f"Unchanged: {page_url}")
+            journal.record_done(page_url)
+            tab_index += 1  # Move to next tab
+        elif response.status_code == 200:
             file_path = os.path.join(OUTPUT_DIR, f"{department}{tab_suffix[tab_index]}.html")
-            with open(file_path, "w", encoding="utf-8") as file:
-                file.write(response.text)
-            print(f"Downloaded: {page_url}")
+            if manifest.update(page_url, response, file_path):
+                with open(file_path, "w", encoding="utf-8") as file:
+                    file.write(response.text)
+                print(f"Downloaded: {page_url}")
+            else:
+                print(f"Unchanged: {page_url}")
+            journal.record_done(page_url)
             tab_index += 1  # Move to next tab
         else:
             print(f"No more pages for {department}, stopping at {tab_suffix[tab_index]}.")
@@ -60,29 +87,69 @@ def download_course_pages(department):
         
         time.sleep(1)  # Respectful crawling
 
-if __name__ == "__main__":
-    print("Fetching department links...")
-    department_links = get_department_links()
-    
-    for dept in department_links:
-        print(f"Processing department: {dept}")
-        download_course_pages(dept)
+    journal.record_done(f"{BASE_URL}{department}")  # Whole department finished
+
+def crawl_catalog(retry_only_failed=False, fresh=False):
+    """Downloads every department's course pages, resuming from the crawl journal."""
+    # Create directory to store downloaded HTML pages
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    # The journal records the department list and finished pages, so an
+    # interrupted crawl resumes at the department and tab where it stopped.
+    journal = CrawlJournal(os.path.join(OUTPUT_DIR, JOURNAL_NAME), fresh=fresh)
+    if journal.has_listing("index"):
+        print(f"Resuming from crawl journal: {journal.summary()}")
+        department_links = [url[len(BASE_URL):] for url in journal.listings["index"]]
+    else:
+        print("Fetching department links...")
+        department_links = get_department_links()
+        journal.record_listing("index", [f"{BASE_URL}{dept}" for dept in department_links])
+        journal.record_listing_end("index")
+
+    if retry_only_failed:
+        retry = set(journal.failed_urls())
+        department_links = [dept for dept in department_links if f"{BASE_URL}{dept}" in retry]
+
+    # Track validators and hashes so re-runs only rewrite pages that changed
+    manifest = CrawlManifest(os.path.join(OUTPUT_DIR, MANIFEST_NAME))
+    changes_path = os.path.join(OUTPUT_DIR, CHANGES_NAME)
+    if journal.done:
+        manifest.changed.extend(read_changes(changes_path))  # Keep the interrupted run's changes
+    try:
+        for dept in department_links:
+            if f"{BASE_URL}{dept}" in journal.done:
+                continue
+            if f"{BASE_URL}{dept}" in journal.failed and not retry_only_failed:
+                continue  # Left for the --retry-failed pass
+            print(f"Processing department: {dept}")
+            download_course_pages(dept, manifest, journal)
+    finally:
+        manifest.save()
+        manifest.write_changes(changes_path)
     
-    print("All course pages downloaded successfully!")
+    print(manifest.summary())
+    print(journal.summary())
+    if journal.is_complete():
+        journal.close(remove=True)  # Finished cleanly; the next run is a fresh (incremental) crawl
+        print("All course pages downloaded successfully!")
+    else:
+        journal.close()
+        print("Some departments failed. Run again with --retry-failed to retry them.")
 
-# merge all the html files in the output folder into one file
-output_file = "Mit2024courses.html"
+def merge_pages():
+    """Merges all the html files in the output folder into one file."""
+    output_file = "Mit2024courses.html"
 
-# Get all HTML files in the folder
-html_files = glob.glob(OUTPUT_DIR + "/"+ "*.html")
+    # Get all HTML files in the folder
+    html_files = glob.glob(OUTPUT_DIR + "/"+ "*.html")
 
-# Merge all HTML files into one
-with open(OUTPUT_DIR+"/"+output_file, "w", encoding="utf-8") as outfile:
-    for file in html_files:
-        with open(file, "r", encoding="utf-8") as infile:
-            outfile.write(infile.read() + "\n")  # Read and append content with a newline
+    # Merge all HTML files into one
+    with open(OUTPUT_DIR+"/"+output_file, "w", encoding="utf-8") as outfile:
+        for file in html_files:
+            with open(file, "r", encoding="utf-8") as infile:
+                outfile.write(infile.read() + "\n")  # Read and append content with a newline
 
-print(f"Merged {len(html_files)} HTML files into {output_file}")
+    print(f"Merged {len(html_files)} HTML files into {output_file}")
 
 #=============================================================================
 # CONVERT TO JSON SCRIPT
@@ -189,11 +256,11 @@ def parse_course_p(p_tag, current_department):
 def parse_courses(html_file_path):
     with open(html_file_path, "r", encoding="utf-8") as f:
         html = f.read()
-    soup = BeautifulSoup(html, "html.parser")
-    
+
     # Extract the department from the <h1> header.
     # Example: <h1>Course 1: Civil and Environmental Engineering<br>IAP/Spring 2025</h1>
-    h1 = soup.find("h1")
+    m_h1 = re.search(r'<h1[\s>].*?</h1>', html, re.S | re.I)
+    h1 = BeautifulSoup(m_h1.group(0), "html.parser").find("h1") if m_h1 else None
     if h1:
         dept_raw = h1.get_text(" ", strip=True)
         # Remove "Course X:" prefix.
@@ -208,20 +275,42 @@ def parse_courses(html_file_path):
         department = ""
 
     # For each <p> tag that contains an <h3>, parse a course.
+    # Each paragraph gets its own small soup: html.parser's tree builder checks
+    # every end tag against all the <br>/<img> tags seen so far, so one soup
+    # of a whole catalog page takes time quadratic in its size.
     courses = []
-    for p_tag in soup.find_all("p"):
-        if p_tag.find("h3"):
-            course = parse_course_p(p_tag, department)
-            courses.append(course)
+    for chunk in re.split(r'(?=<p[\s>])', html, flags=re.I):
+        for p_tag in BeautifulSoup(chunk, "html.parser").find_all("p"):
+            if p_tag.find("h3"):
+                course = parse_course_p(p_tag, department)
+                courses.append(course)
     return {"courses": courses}
 
-if __name__ == '__main__':
+def run(datasets=None, retry_only_failed=False, fresh=False):
+    """Pipeline entry point: crawls, merges and parses the 2024 catalog, returning {"mit_2024": {"courses": [...]}}."""
+    crawl_catalog(retry_only_failed, fresh)
+    merge_pages()
+
     html_file = "mit_course_pages3/Mit2024courses.html"  # Replace with your HTML file path
     data = parse_courses(html_file)
     print(json.dumps(data, indent=2))
 
+    #save the output to a file
+    with open("11_mit_2024.json", "w") as f:
+        json.dump(data, f, indent=2)
 
-#save the output to a file
-with open("11_mit_2024.json", "w") as f:
-    json.dump(data, f, indent=2)
+    # add the catalog to the institution/year/department partitioned dataset
+    from partitioned import write_partitioned
+    manifest = write_partitioned(data["courses"], "MIT", 2024)
+    print(f"Partitioned dataset updated: {len(manifest['partitions'])} MIT 2024 departments")
+    return {"mit_2024": data}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Download and parse the MIT 2024 course catalog.")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Only revisit the departments the previous crawl journaled as failed")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Discard any interrupted crawl journal and start over")
+    args = parser.parse_args()
 
+    run(retry_only_failed=args.retry_failed, fresh=args.fresh)
@@ -12,43 +12,70 @@
 # -----------------------------------------------
 #extracting the course data from json files
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
+from charts import chart, render, cache_summary
 
-#read the json files
-with open('10_mit_1996.json') as f:
-    data_1996 = json.load(f)
+#plot the data
+def draw_change(departments, changes):
+    import pandas as pd
+    import matplotlib.pyplot as plt
 
-#read from the second json file
-with open('11_mit_2024.json') as f:
-    data_2024 = json.load(f)
+    course_change = pd.DataFrame({"Change": changes}, index=pd.Index(departments, name="department"))
+    axes = course_change.plot(kind='bar', y='Change', title='Change in Number of Courses by Department', figsize=(10, 6))
+    plt.ylabel('Change in Number of Courses')
+    return axes.figure
 
-#convert the data to dataframes
-df_1996 = pd.DataFrame(data_1996)
-#df_2024 = pd.DataFrame(data_2024)
-df_2024=pd.DataFrame(data_2024["courses"])
+def run(datasets=None, show=False):
+    """Pipeline entry point: counts courses per department in both catalogs and plots the change."""
+    import pandas as pd
 
-course_count_1996 = df_1996.groupby('department').size().rename('1996')
-course_count_2024 = df_2024.groupby('department').size().rename('2024')
+    # Use the catalogs 10 and 11 just produced if they are in memory
+    datasets = datasets or {}
+    data_1996 = datasets.get("mit_1996")
+    data_2024 = datasets.get("mit_2024")
 
-#merge the two dataframes
-course_count = pd.merge(course_count_1996, course_count_2024, on='department', how='outer')
-course_count.columns = ['1996', '2024']
-course_count.fillna(0, inplace=True)
+    #read the json files
+    if data_1996 is None:
+        with open('10_mit_1996.json') as f:
+            data_1996 = json.load(f)
 
-#calculate the change in the number of courses
-course_count['Change'] = course_count['2024'] - course_count['1996']
+    #read from the second json file
+    if data_2024 is None:
+        with open('11_mit_2024.json') as f:
+            data_2024 = json.load(f)
 
-#sort the data by the change in the number of courses
-course_count = course_count.sort_values(by='Change', ascending=False)
+    #convert the data to dataframes
+    df_1996 = pd.DataFrame(data_1996)
+    #df_2024 = pd.DataFrame(data_2024)
+    df_2024=pd.DataFrame(data_2024["courses"])
 
-#display the data
-print(course_count)
-#save the data to a csv file
-course_count.to_csv('course_count.csv')
-#plot the data
-course_count.plot(kind='bar', y='Change', title='Change in Number of Courses by Department', figsize=(10, 6))
-plt.ylabel('Change in Number of Courses')
-plt.show()
-#save the plot
-plt.savefig('course_change.png')
\ No newline at end of file
+    course_count_1996 = df_1996.groupby('department').size().rename('1996')
+    course_count_2024 = df_2024.groupby('department').size().rename('2024')
+
+    #merge the two dataframes
+    course_count = pd.merge(course_count_1996, course_count_2024, on='department', how='outer')
+    course_count.columns = ['1996', '2024']
+    course_count.fillna(0, inplace=True)
+
+    #calculate the change in the number of courses
+    course_count['Change'] = course_count['2024'] - course_count['1996']
+
+    #sort the data by the change in the number of courses
+    course_count = course_count.sort_values(by='Change', ascending=False)
+
+    #display the data
+    print(course_count)
+    #save the data to a csv file
+    course_count.to_csv('course_count.csv')
+    #plot the data and save the plot
+    rendered = render([chart(draw_change, 'course_change.png',
+                             departments=course_count.index.tolist(), changes=course_count['Change'].tolist())], show=show)
+    print(cache_summary(rendered))
+    return {}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare course counts per department, 1996 vs 2024.")
+    parser.add_argument("--show", action="store_true", help="Also open the chart in a window")
+    args = parser.parse_args()
+    run(show=args.show)
@@ -8,106 +8,139 @@
 # -----------------------------------------------
 # Extracting the course data from json files
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-from nltk.corpus import stopwords
-from collections import Counter
-import re
-from wordcloud import WordCloud
-
-# Read the json files
-with open('10_mit_1996.json') as f:
-    data_1996 = json.load(f)
-
-# Read from the second json file
-with open('11_mit_2024.json') as f:
-    data_2024 = json.load(f)
-
-# Convert the data to dataframes
-df_1996 = pd.DataFrame(data_1996)
-#df_2024 = pd.DataFrame(data_2024)
-df_2024 = pd.DataFrame(data_2024["courses"])
-
-# Get the course titlesa
-course_titles_1996 = df_1996['title'].dropna()
-course_titles_2024 = df_2024['course_name'].dropna()
-
-# Preprocessing the course titles and removing stopwords
-stop_words = set(stopwords.words("english"))
-
-# Function to process text
-def preprocess_titles(titles):
-    word_list = []
-    for title in titles:
-        words = re.findall(r"\b[a-zA-Z]+\b", title.lower())  # Extract words
-        words = [word for word in words if word not in stop_words]  # Remove stopwords
-        word_list.extend(words)
-    return word_list
-
-# Process words for each year
-word_list_1996 = preprocess_titles(course_titles_1996)
-word_list_2024 = preprocess_titles(course_titles_2024)
-
-# Perform word frequency count
-word_counts_1996 = Counter(word_list_1996)
-word_counts_2024 = Counter(word_list_2024)
-
-# Get the top 20 most common words
-common_words_1996 = word_counts_1996.most_common(20)
-common_words_2024 = word_counts_2024.most_common(20)
-
-# Convert to DataFrame for visualization
-df_common_1996 = pd.DataFrame(common_words_1996, columns=["Word", "Frequency"])
-df_common_2024 = pd.DataFrame(common_words_2024, columns=["Word", "Frequency"])
-
-# Plot side-by-side bar charts
-fig, axes = plt.subplots(1, 2, figsize=(14, 6))
-
-axes[0].barh(df_common_1996["Word"], df_common_1996["Frequency"], color='blue')
-axes[0].invert_yaxis()
-axes[0].set_title("Top 20 Words in Course Titles (1996)")
-axes[0].set_xlabel("Frequency")
-
-axes[1].barh(df_common_2024["Word"], df_common_2024["Frequency"], color='red')
-axes[1].invert_yaxis()
-axes[1].set_title("Top 20 Words in Course Titles (2024)")
-axes[1].set_xlabel("Frequency")
-
-plt.tight_layout()
-plt.show()
-
-# Generate word clouds
-wordcloud_1996 = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(word_counts_1996)
-wordcloud_2024 = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(word_counts_2024)
-
-# Display word clouds
-fig, axes = plt.subplots(1, 2, figsize=(14, 6))
-axes[0].imshow(wordcloud_1996, interpolation='bilinear')
-axes[0].axis("off")
-axes[0].set_title("Word Cloud of Course Titles (1996)")
-
-axes[1].imshow(wordcloud_2024, interpolation='bilinear')
-axes[1].axis("off")
-axes[1].set_title("Word Cloud of Course Titles (2024)")
-
-plt.tight_layout()
-plt.show()
-#save the plot
-plt.savefig('word_clouds.png')
-
-# Compute word frequency changes
-df_word_changes = pd.DataFrame.from_dict(word_counts_2024, orient='index', columns=['2024'])
-df_word_changes['1996'] = df_word_changes.index.map(lambda word: word_counts_1996.get(word, 0))
-df_word_changes['Change'] = df_word_changes['2024'] - df_word_changes['1996']
-df_word_changes = df_word_changes.sort_values(by='Change', ascending=False).head(20)
+from stopwords import load_stopwords
+from token_store import open_store
+from charts import chart, fan_out, render, cache_summary
+
+DEPARTMENT_DIR = "title_evolution"  # Per-department charts, with --per-department
+
+# Plot side-by-side bar charts of the most common words
+def draw_top_words(top_1996, top_2024, title="Top 20 Words in Course Titles"):
+    import matplotlib.pyplot as plt
+
+    figure, axes = plt.subplots(1, 2, figsize=(14, 6))
+    for ax, top, year, color in ((axes[0], top_1996, "1996", 'blue'), (axes[1], top_2024, "2024", 'red')):
+        ax.barh([word for word, _ in top], [count for _, count in top], color=color)
+        ax.invert_yaxis()
+        ax.set_title(f"{title} ({year})")
+        ax.set_xlabel("Frequency")
+
+    plt.tight_layout()
+    return figure
+
+# Generate and display word clouds
+def draw_word_clouds(counts_1996, counts_2024, width=800, height=400, max_words=200):
+    import matplotlib.pyplot as plt
+    from wordcloud import WordCloud
+
+    wordcloud_1996 = WordCloud(width=width, height=height, background_color='white', max_words=max_words).generate_from_frequencies(counts_1996)
+    wordcloud_2024 = WordCloud(width=width, height=height, background_color='white', max_words=max_words).generate_from_frequencies(counts_2024)
+
+    figure, axes = plt.subplots(1, 2, figsize=(14, 6))
+    axes[0].imshow(wordcloud_1996, interpolation='bilinear')
+    axes[0].axis("off")
+    axes[0].set_title("Word Cloud of Course Titles (1996)")
+
+    axes[1].imshow(wordcloud_2024, interpolation='bilinear')
+    axes[1].axis("off")
+    axes[1].set_title("Word Cloud of Course Titles (2024)")
+
+    plt.tight_layout()
+    return figure
 
 # Plot word frequency changes
-plt.figure(figsize=(10, 6))
-plt.barh(df_word_changes.index, df_word_changes['Change'], color=['green' if x > 0 else 'red' for x in df_word_changes['Change']])
-plt.xlabel("Frequency Change")
-plt.ylabel("Word")
-plt.title("Top 20 Words with Greatest Change in Frequency (2024 vs. 1996)")
-plt.gca().invert_yaxis()
-plt.show()
-# Save the plot
-plt.savefig('word_frequency_changes.png')
\ No newline at end of file
+def draw_changes(words, changes):
+    import matplotlib.pyplot as plt
+
+    figure = plt.figure(figsize=(10, 6))
+    plt.barh(words, changes, color=['green' if x > 0 else 'red' for x in changes])
+    plt.xlabel("Frequency Change")
+    plt.ylabel("Word")
+    plt.title("Top 20 Words with Greatest Change in Frequency (2024 vs. 1996)")
+    plt.gca().invert_yaxis()
+    return figure
+
+def run(datasets=None, show=False, per_department=False):
+    """
+    Pipeline entry point: compares title word frequencies between the two
+    catalogs, and with `per_department` draws one chart per department.
+    """
+    import pandas as pd
+
+    # Use the catalogs 10 and 11 just produced if they are in memory
+    datasets = datasets or {}
+    data_1996 = datasets.get("mit_1996")
+    data_2024 = datasets.get("mit_2024")
+
+    # Read the json files
+    if data_1996 is None:
+        with open('10_mit_1996.json') as f:
+            data_1996 = json.load(f)
+
+    # Read from the second json file
+    if data_2024 is None:
+        with open('11_mit_2024.json') as f:
+            data_2024 = json.load(f)
+
+    # Convert the data to dataframes
+    df_1996 = pd.DataFrame(data_1996)
+    #df_2024 = pd.DataFrame(data_2024)
+    df_2024 = pd.DataFrame(data_2024["courses"])
+
+    # Get the course titlesa, one row per title so row i is document i of the token store
+    df_1996 = df_1996.dropna(subset=['title']).reset_index(drop=True)
+    df_2024 = df_2024.dropna(subset=['course_name']).reset_index(drop=True)
+
+    # Tokenize each catalog's titles once, into the shared token store (see
+    # token_store.py); reused as long as the titles do not change
+    store_1996 = open_store("mit_1996_titles", df_1996['title'])
+    store_2024 = open_store("mit_2024_titles", df_2024['course_name'])
+
+    # Perform word frequency count on the token ids, stopwords removed
+    stop_words = load_stopwords("english")
+    word_counts_1996 = store_1996.frequencies(stop_words)
+    word_counts_2024 = store_2024.frequencies(stop_words)
+
+    # Get the top 20 most common words
+    common_words_1996 = word_counts_1996.most_common(20)
+    common_words_2024 = word_counts_2024.most_common(20)
+
+    # Compute word frequency changes
+    df_word_changes = pd.DataFrame.from_dict(word_counts_2024, orient='index', columns=['2024'])
+    df_word_changes['1996'] = df_word_changes.index.map(lambda word: word_counts_1996.get(word, 0))
+    df_word_changes['Change'] = df_word_changes['2024'] - df_word_changes['1996']
+    df_word_changes = df_word_changes.sort_values(by='Change', ascending=False).head(20)
+
+    # Every chart is built once and saved once (see charts.py), all in parallel
+    jobs = [
+        chart(draw_top_words, 'top_words.png', top_1996=common_words_1996, top_2024=common_words_2024),
+        chart(draw_word_clouds, 'word_clouds.png', counts_1996=dict(word_counts_1996), counts_2024=dict(word_counts_2024)),
+        chart(draw_changes, 'word_frequency_changes.png',
+              words=df_word_changes.index.tolist(), changes=df_word_changes['Change'].tolist()),
+    ]
+    if per_department:
+        # Top title words of each department in both years, one chart per department
+        titles_by_department = {}
+        for year, df in (("1996", df_1996), ("2024", df_2024)):
+            for department, rows in df.groupby('department').indices.items():
+                titles_by_department.setdefault(department, {"1996": [], "2024": []})[year] = rows
+        departments = {
+            department: {"top_1996": store_1996.frequencies(stop_words, rows["1996"]).most_common(10),
+                         "top_2024": store_2024.frequencies(stop_words, rows["2024"]).most_common(10),
+                         "title": f"{department}: Top 10 Title Words"}
+            for department, rows in titles_by_department.items()
+        }
+        jobs += fan_out(draw_top_words, DEPARTMENT_DIR + "/{key}.png", departments)
+    rendered = render(jobs, show=show)
+    print(cache_summary(rendered))
+    return {}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare title word frequencies, 1996 vs 2024.")
+    parser.add_argument("--show", action="store_true", help="Also open the charts in windows")
+    parser.add_argument("--per-department", action="store_true",
+                        help=f"Also draw each department's top title words into {DEPARTMENT_DIR}/")
+    args = parser.parse_args()
+    run(show=args.show, per_department=args.per_department)
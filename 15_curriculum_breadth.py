@@ -7,109 +7,168 @@
 #  interdisciplinary or specialized.
 # -----------------------------------------------
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from collections import Counter
-from sklearn.feature_extraction.text import TfidfVectorizer
-from wordcloud import WordCloud
-
-# Load course data
-with open('10_mit_1996.json') as f:
-    data_1996 = json.load(f)
-
-with open('11_mit_2024.json') as f:
-    data_2024 = json.load(f)
-
-# Convert to DataFrames
-df_1996 = pd.DataFrame(data_1996)
-df_2024 = pd.DataFrame(data_2024["courses"])
-
-# Extract course titles and departments
-titles_1996 = df_1996['title'].dropna().tolist()
-titles_2024 = df_2024['course_title'].dropna().tolist()
-
-departments_1996 = df_1996['department'].dropna().tolist()
-departments_2024 = df_2024['department'].dropna().tolist()
-
-# Define interdisciplinary categories
-interdisciplinary_keywords = {
-    'AI': ['machine learning', 'artificial intelligence', 'deep learning', 'neural network'],
-    'Sustainability': ['climate', 'sustainability', 'renewable', 'environment'],
-    'Healthcare': ['biomedical', 'health', 'medicine', 'neuroscience'],
-    'Energy': ['energy', 'power systems', 'nuclear'],
-    'Policy': ['policy', 'law', 'governance', 'regulation']
-}
-
-# Function to classify courses based on keywords
-def classify_courses(titles):
-    category_counts = Counter()
-    for title in titles:
-        for category, keywords in interdisciplinary_keywords.items():
-            if any(keyword in title.lower() for keyword in keywords):
-                category_counts[category] += 1
-    return category_counts
-
-# Classify courses
-categories_1996 = classify_courses(titles_1996)
-categories_2024 = classify_courses(titles_2024)
-
-# Convert classification to DataFrame
-df_categories = pd.DataFrame([categories_1996, categories_2024], index=['1996', '2024']).fillna(0)
-
-# Compute word diversity using TF-IDF
-vectorizer = TfidfVectorizer(stop_words='english')
-word_matrix_1996 = vectorizer.fit_transform(titles_1996)
-word_matrix_2024 = vectorizer.fit_transform(titles_2024)
-
-word_diversity_1996 = len(vectorizer.get_feature_names_out())
-word_diversity_2024 = len(vectorizer.get_feature_names_out())
+from stopwords import load_stopwords
+from token_store import open_store
+from breadth import BreadthIndex, HASH_FEATURES
+from charts import chart, render, cache_summary
+
+# Text columns of each catalog, by field
+FIELDS = {"titles": {"1996": "title", "2024": "course_name"},
+          "descriptions": {"1996": "description", "2024": "description"}}
 
 # Plot interdisciplinary category comparison
-plt.figure(figsize=(10, 6))
-df_categories.T.plot(kind='bar', figsize=(12, 6))
-plt.title("Interdisciplinary Course Presence: 1996 vs. 2024")
-plt.xlabel("Category")
-plt.ylabel("Number of Courses")
-plt.xticks(rotation=45)
-plt.legend(title="Year")
-plt.savefig("interdisciplinary_trends.png")
-plt.savefig("15_breadth_visual.png")
-plt.show()
+def draw_categories(categories, counts_1996, counts_2024):
+    import pandas as pd
+    import matplotlib.pyplot as plt
+
+    df_categories = pd.DataFrame({"1996": counts_1996, "2024": counts_2024}, index=categories)
+    axes = df_categories.plot(kind='bar', figsize=(12, 6))
+    plt.title("Interdisciplinary Course Presence: 1996 vs. 2024")
+    plt.xlabel("Category")
+    plt.ylabel("Number of Courses")
+    plt.xticks(rotation=45)
+    plt.legend(title="Year")
+    return axes.figure
 
 # Plot word cloud of course titles
-wordcloud_1996 = WordCloud(width=800, height=400, background_color='white').generate(" ".join(titles_1996))
-wordcloud_2024 = WordCloud(width=800, height=400, background_color='white').generate(" ".join(titles_2024))
-
-fig, axes = plt.subplots(1, 2, figsize=(14, 6))
-axes[0].imshow(wordcloud_1996, interpolation='bilinear')
-axes[0].axis("off")
-axes[0].set_title("Word Cloud of Course Titles (1996)")
-
-axes[1].imshow(wordcloud_2024, interpolation='bilinear')
-axes[1].axis("off")
-axes[1].set_title("Word Cloud of Course Titles (2024)")
-
-plt.savefig("wordcloud_comparison.png")
-plt.show()
-
-# Print diversity results
-print(f"Unique Words in Course Titles (1996): {word_diversity_1996}")
-print(f"Unique Words in Course Titles (2024): {word_diversity_2024}")
-
-# Save results to JSON
-results = {
-    "word_diversity": {
-        "1996": word_diversity_1996,
-        "2024": word_diversity_2024
-    },
-    "interdisciplinary_categories": {
-        "1996": categories_1996,
-        "2024": categories_2024
+def draw_word_clouds(text_1996, text_2024, width=800, height=400, max_words=200):
+    import matplotlib.pyplot as plt
+    from wordcloud import WordCloud
+
+    wordcloud_1996 = WordCloud(width=width, height=height, background_color='white', max_words=max_words).generate(text_1996)
+    wordcloud_2024 = WordCloud(width=width, height=height, background_color='white', max_words=max_words).generate(text_2024)
+
+    figure, axes = plt.subplots(1, 2, figsize=(14, 6))
+    axes[0].imshow(wordcloud_1996, interpolation='bilinear')
+    axes[0].axis("off")
+    axes[0].set_title("Word Cloud of Course Titles (1996)")
+
+    axes[1].imshow(wordcloud_2024, interpolation='bilinear')
+    axes[1].axis("off")
+    axes[1].set_title("Word Cloud of Course Titles (2024)")
+    return figure
+
+def run(datasets=None, show=False, hash_features=None):
+    """
+    Pipeline entry point: compares interdisciplinary coverage and the breadth
+    of the title and description vocabularies. `hash_features` hashes terms
+    into that many columns instead of building the joint vocabulary.
+    """
+    import pandas as pd
+
+    # Use the catalogs 10 and 11 just produced if they are in memory
+    datasets = datasets or {}
+    data_1996 = datasets.get("mit_1996")
+    data_2024 = datasets.get("mit_2024")
+
+    # Load course data
+    if data_1996 is None:
+        with open('10_mit_1996.json') as f:
+            data_1996 = json.load(f)
+
+    if data_2024 is None:
+        with open('11_mit_2024.json') as f:
+            data_2024 = json.load(f)
+
+    # Convert to DataFrames
+    df_1996 = pd.DataFrame(data_1996)
+    df_2024 = pd.DataFrame(data_2024["courses"])
+
+    # Extract course titles and departments
+    titles_1996 = df_1996['title'].dropna().tolist()
+    titles_2024 = df_2024['course_name'].dropna().tolist()
+
+    # Define interdisciplinary categories
+    interdisciplinary_keywords = {
+        'AI': ['machine learning', 'artificial intelligence', 'deep learning', 'neural network'],
+        'Sustainability': ['climate', 'sustainability', 'renewable', 'environment'],
+        'Healthcare': ['biomedical', 'health', 'medicine', 'neuroscience'],
+        'Energy': ['energy', 'power systems', 'nuclear'],
+        'Policy': ['policy', 'law', 'governance', 'regulation']
+    }
+
+    # Function to classify courses based on keywords
+    def classify_courses(titles):
+        category_counts = Counter()
+        for title in titles:
+            for category, keywords in interdisciplinary_keywords.items():
+                if any(keyword in title.lower() for keyword in keywords):
+                    category_counts[category] += 1
+        return category_counts
+
+    # Classify courses
+    categories_1996 = classify_courses(titles_1996)
+    categories_2024 = classify_courses(titles_2024)
+
+    # Convert classification to DataFrame
+    df_categories = pd.DataFrame([categories_1996, categories_2024], index=['1996', '2024']).fillna(0)
+
+    # Breadth of the vocabularies: every catalog and field tokenized once into
+    # the shared token store (see token_store.py), the titles being the same
+    # tokens 13 counts, then laid on one set of columns (see breadth.py)
+    stop_words = load_stopwords("english")
+    stores, departments = {}, {}
+    for field, columns in FIELDS.items():
+        for year, df in (("1996", df_1996), ("2024", df_2024)):
+            rows = df.dropna(subset=[columns[year]])
+            stores[(year, field)] = open_store(f"mit_{year}_{field}", rows[columns[year]])
+            departments[(year, field)] = rows['department'].tolist() if 'department' in rows else None
+    index = BreadthIndex(stores, stop_words, n_features=hash_features)
+    breadth = {year: {} for year in ("1996", "2024")}
+    for (year, field), store in stores.items():
+        breadth[year][field] = index.diversity((year, field), departments[(year, field)])
+        breadth[year][field]["top_terms"] = index.top_terms((year, field))
+
+    # Terms that occur in at least one title of each catalog
+    word_diversity_1996 = breadth["1996"]["titles"]["distinct_terms"]
+    word_diversity_2024 = breadth["2024"]["titles"]["distinct_terms"]
+
+    # Save the plots, each built once (see charts.py), both in parallel
+    rendered = render([
+        chart(draw_categories, ["interdisciplinary_trends.png", "15_breadth_visual.png"],
+              categories=df_categories.columns.tolist(),
+              counts_1996=df_categories.loc['1996'].tolist(), counts_2024=df_categories.loc['2024'].tolist()),
+        chart(draw_word_clouds, "wordcloud_comparison.png",
+              text_1996=" ".join(titles_1996), text_2024=" ".join(titles_2024)),
+    ], show=show)
+    print(cache_summary(rendered))
+
+    # Print diversity results
+    print(f"Unique Words in Course Titles (1996): {word_diversity_1996}")
+    print(f"Unique Words in Course Titles (2024): {word_diversity_2024}")
+    for field in FIELDS:
+        for year in ("1996", "2024"):
+            metrics = breadth[year][field]
+            print(f"  {field:<13}{year}: {metrics['distinct_terms']:>7} terms, {metrics['entropy_bits']:>6.2f} bits, "
+                  f"terms in {metrics.get('mean_departments_per_term', 0):.2f} departments on average")
+
+    # Save results to JSON
+    results = {
+        "word_diversity": {
+            "1996": word_diversity_1996,
+            "2024": word_diversity_2024
+        },
+        "interdisciplinary_categories": {
+            "1996": categories_1996,
+            "2024": categories_2024
+        },
+        "breadth": breadth
     }
-}
 
-with open('curriculum_breadth_analysis.json', 'w') as f:
-    json.dump(results, f, indent=4)
+    with open('curriculum_breadth_analysis.json', 'w') as f:
+        json.dump(results, f, indent=4)
+
+    print("Analysis saved to curriculum_breadth_analysis.json")
+    return {}
+
+if __name__ == "__main__":
+    import argparse
 
-print("Analysis saved to curriculum_breadth_analysis.json")
+    parser = argparse.ArgumentParser(description="Compare the breadth of the 1996 and 2024 curricula.")
+    parser.add_argument("--show", action="store_true", help="Also open the charts in windows")
+    parser.add_argument("--hash-features", type=int, nargs="?", const=HASH_FEATURES,
+                        help=f"Hash terms into this many columns (default {HASH_FEATURES}) "
+                             "instead of building the joint vocabulary")
+    args = parser.parse_args()
+    run(show=args.show, hash_features=args.hash_features)
@@ -0,0 +1,110 @@
+"""
+bench_imports.py
+
+Import-time benchmark for the pipeline's modules.
+
+Importing a stage should be close to free: the pipeline runner imports
+every stage it runs, and heavy libraries (pandas, matplotlib, nltk, sklearn,
+wordcloud, pyarrow, bs4, PyMuPDF) belong inside the functions that use
+them. This imports each module in a fresh interpreter under
+`python -X importtime` and reports how long it took, plus the heaviest
+packages it pulled in, so a stray top-level import shows up straight away:
+
+    python bench_imports.py                  # table for every module
+    python bench_imports.py 06_frequency     # just these modules
+    python bench_imports.py --budget-ms 50   # exit 1 if any module is slower
+    python bench_imports.py --json .cache/import_times.json
+"""
+
+import os
+import sys
+import glob
+import json
+import subprocess
+
+HELPER_MODULES = ["crawler", "crawl_manifest", "crawl_journal", "page_store", "parse_cache",
+                  "records", "columnar", "partitioned", "telemetry", "stopwords", "textcount", "token_store",
+                  "breadth", "charts", "synthetic_catalog"]
+
+
+def default_modules():
+    stages = sorted(os.path.splitext(path)[0] for path in glob.glob("[0-9][0-9]_*.py"))
+    return stages + [name for name in HELPER_MODULES if os.path.exists(name + ".py")]
+
+
+def _importtime(code):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and name[1:2] != " ":
+            # Not indented: imported directly, not as part of another package
+            packages[name.strip()] = int(cumulative)
+    return result.stdout, packages
+
+
+STARTUP = None  # Packages every interpreter imports before running any code
+
+
+def import_profile(module):
+    """
+    Imports `module` in a fresh interpreter and returns (microseconds,
+    {package imported directly: microseconds}).
+    """
+    global STARTUP
+    if STARTUP is None:
+        STARTUP = set(_importtime("pass")[1])
+    code = ("import time, importlib; start = time.perf_counter(); "
+            f"importlib.import_module({module!r}); print(int((time.perf_counter() - start) * 1e6))")
+    try:
+        stdout, packages = _importtime(code)
+    except RuntimeError as e:
+        raise RuntimeError(f"importing {module} failed: {e}")
+    packages = {name: us for name, us in packages.items() if name not in STARTUP and name != "importlib"}
+    return int(stdout.strip().splitlines()[-1]), packages
+
+
+def bench(module, repeat=3):
+    """Best of `repeat` fresh-interpreter imports, in milliseconds, with its heaviest packages."""
+    runs = [import_profile(module) for _ in range(repeat)]
+    total, packages = min(runs, key=lambda run: run[0])
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:3]
+    return {"module": module, "ms": round(total / 1000, 1),
+            "heaviest": {name: round(us / 1000, 1) for name, us in heaviest}}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure how long each pipeline module takes to import.")
+    parser.add_argument("modules", nargs="*", help="Modules to measure (default: every stage and helper)")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh-interpreter imports per module (best is kept)")
+    parser.add_argument("--budget-ms", type=float, help="Fail if any module takes longer than this to import")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    failed = False
+    print(f"{'module':<26}{'import ms':>10}   heaviest imports (ms)")
+    for module in args.modules or default_modules():
+        try:
+            result = bench(module, args.repeat)
+        except RuntimeError as e:
+            print(f"{module:<26}{'error':>10}   {e}")
+            failed = True
+            continue
+        results.append(result)
+        heaviest = ", ".join(f"{name} {ms:g}" for name, ms in result["heaviest"].items())
+        over = args.budget_ms is not None and result["ms"] > args.budget_ms
+        failed = failed or over
+        print(f"{module:<26}{result['ms']:>10.1f}   {heaviest}{'   OVER BUDGET' if over else ''}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,287 @@
+"""
+bench_stages.py
+
+Scale benchmark for the pipeline stages, on synthetic corpora 1x, 10x and
+100x the size of the real one (see synthetic_catalog.py), so every
+optimization can be measured against a baseline offline:
+
+    python bench_stages.py                               # every stage at 1x, 10x, 100x
+    python bench_stages.py --scales 1 10 --stages 03_parse 08_export
+    python bench_stages.py --scales 1 --compare .cache/bench/<earlier>.json
+
+Measured stages:
+    02_combine    merge the BU pages into one document
+    03_parse      parse the BU pages into clean records
+    04_clean      clean raw-HTML records (from 03_parse --raw-html)
+    06_frequency  count title words
+    06_ngrams     count 1-, 2- and 3-grams in the course descriptions
+    08_export     write the JSON, JSON Lines, Parquet, Arrow and partitioned exports
+    10_parse      parse the 1996 catalog text
+    11_parse      parse the merged MIT 2024 pages
+
+Each stage runs in a fresh process with the corpus folder as its working
+directory, `--repeat` times, after its inputs have been produced (untimed).
+For each stage and scale the results file records:
+- records processed
+- wall time percentiles over the repeats (p50, p95, min)
+- CPU time, p50
+- peak RSS, the highest over the repeats
+- throughput from the p50 time, in records/s and input MB/s
+
+The first repeat also pays for the stage's lazy imports, so it shows up in
+the p95. The results go to .cache/bench/bench-<time>.json and latest.json.
+A stage that fails is recorded with its error, the others still run, and
+the benchmark exits with status 1.
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import importlib
+import contextlib
+import subprocess
+from synthetic_catalog import generate
+from telemetry import measure_in_process, artifact_bytes, count_records
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(".cache", "bench_data")
+RESULT_DIR = os.path.join(".cache", "bench")
+STAGES = ["02_combine", "03_parse", "04_clean", "06_frequency", "06_ngrams", "08_export", "10_parse", "11_parse"]
+SCALES = [1, 10, 100]
+MERGED_NAME = "02_mergedhtmlsbu.html"  # What 02_combine.py writes next to the pages
+
+
+#==============================================================================
+# STAGES (run inside the corpus folder, in a child process)
+#==============================================================================
+def _stage(name):
+    return importlib.import_module(name)
+
+
+def prepare(stage, info):
+    """
+    Produces `stage`'s inputs (untimed) and returns (call, input paths).
+    `call()` runs the stage once and returns how many records it processed.
+    """
+    pages = info["paths"]["bu_pages"]
+    cleaned = os.path.join("output_folder", "04_cleaned_courses.jsonl")
+
+    def ensure_cleaned():
+        if not os.path.exists(cleaned):
+            _stage("03_parse").run(use_cache=False)
+
+    if stage == "02_combine":
+        def combine():
+            _stage("02_combine").run()
+            return info["counts"]["bu_pages"]
+        return combine, [pages]
+    if stage == "03_parse":
+        def parse():
+            _stage("03_parse").run(use_cache=False)
+            return count_records(cleaned)
+        return parse, [pages]
+    if stage == "04_clean":
+        _stage("03_parse").run(raw=True, use_cache=False)
+
+        def clean():
+            _stage("04_clean").run(use_cache=False)
+            return count_records(cleaned)
+        return clean, [os.path.join("output_folder", "03_parsed_courses.jsonl")]
+    if stage == "06_frequency":
+        ensure_cleaned()
+        titles = _stage("05_extract").run()["course_titles"]
+
+        def frequency():
+            _stage("06_frequency").run(use_store=False)  # Time the tokenizing, not a stored copy
+            return len(titles)
+        return frequency, [os.path.join("output_folder", "05_course_titles.txt")]
+    if stage == "06_ngrams":
+        ensure_cleaned()
+        descriptions = len(_stage("06_frequency").load_texts("descriptions"))
+
+        def ngrams():
+            _stage("06_frequency").run(fields=("descriptions",), ngrams=(1, 2, 3), workers=os.cpu_count() or 1,
+                                       use_store=False)
+            return descriptions
+        return ngrams, [cleaned]
+    if stage == "08_export":
+        ensure_cleaned()
+
+        def export():
+            _stage("08_export").run()
+            return count_records(os.path.join("output_folder", "08_refined_courses.jsonl"))
+        return export, [cleaned]
+    if stage == "10_parse":
+        module = _stage("10_extract_1996")
+        with open(info["paths"]["mit_1996"], "r", encoding="utf-8") as f:
+            text = f.read()
+        department_map = module.load_department_map("lookuptable.json")
+        return lambda: len(module.parse_courses(text, department_map)), [info["paths"]["mit_1996"]]
+    if stage == "11_parse":
+        module = _stage("11_extract_2024")
+        path = info["paths"]["mit_2024"]
+        return lambda: len(module.parse_courses(path)["courses"]), [path]
+    raise ValueError(f"Unknown stage {stage!r}")
+
+
+def percentile(values, q):
+    """Linearly interpolated percentile (q in 0-100) of a non-empty list."""
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def measure_stage(stage, folder, repeat):
+    """Runs `stage` `repeat` times inside `folder` and summarizes the runs."""
+    with open(os.path.join(folder, "_synthetic.json"), "r", encoding="utf-8") as f:
+        info = json.load(f)
+    os.chdir(folder)
+    os.environ["OUTPUT_DIR"] = info["paths"]["bu_pages"]  # Read by 02 and 03 at import
+    os.environ.setdefault("MPLBACKEND", "Agg")
+
+    runs = []
+    with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+        call, inputs = prepare(stage, info)
+        input_bytes = sum(artifact_bytes(path) for path in inputs)
+        for _ in range(repeat):
+            gc.collect()
+            metrics = {}
+            with measure_in_process(metrics):
+                metrics["records"] = call()
+            runs.append(metrics)
+
+    wall = [run["wall_s"] for run in runs]
+    p50 = percentile(wall, 50)
+    records = runs[-1]["records"]
+    return {
+        "stage": stage,
+        "scale": info["params"]["scale"],
+        "records": records,
+        "input_mb": round(input_bytes / 1e6, 2),
+        "repeat": repeat,
+        "wall_p50_s": round(p50, 4),
+        "wall_p95_s": round(percentile(wall, 95), 4),
+        "wall_min_s": min(wall),
+        "cpu_p50_s": round(percentile([run["cpu_s"] for run in runs], 50), 4),
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+        "records_per_s": round(records / p50, 1) if p50 else None,
+        "mb_per_s": round(input_bytes / 1e6 / p50, 2) if p50 else None,
+    }
+
+
+#==============================================================================
+# RESULTS
+#==============================================================================
+def run_benchmark(stages, scales, repeat, data_dir=DATA_DIR, seed=0):
+    """Generates (or reuses) each scale's corpus and measures every stage on it in a fresh process."""
+    results = []
+    for scale in scales:
+        folder = os.path.abspath(os.path.join(data_dir, f"scale-{scale:g}x"))
+        print(f"Preparing the {scale:g}x corpus in {folder}...")
+        info = generate(folder, scale, seed, template=os.path.join(REPO_DIR, "bu_courses", "cas-aa-103.html"))
+        print("  " + ", ".join(f"{count} {name}" for name, count in info["counts"].items()))
+        for stage in stages:
+            # A stage leaves outputs the next one might mistake for its inputs
+            for name in os.listdir(os.path.join(folder, "output_folder")):
+                os.remove(os.path.join(folder, "output_folder", name))
+            merged = os.path.join(folder, info["paths"]["bu_pages"], MERGED_NAME)
+            if os.path.exists(merged):
+                os.remove(merged)
+            command = [sys.executable, os.path.abspath(__file__), "measure", stage, folder, "--repeat", str(repeat)]
+            process = subprocess.run(command, capture_output=True, text=True)
+            if process.returncode != 0:
+                error = (process.stderr.strip().splitlines() or ["no output"])[-1]
+                print(f"  {stage:<14} failed: {error}")
+                results.append({"stage": stage, "scale": scale, "error": error})
+                continue
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            print(f"  {stage:<14} p50 {result['wall_p50_s']:>8.3f}s  {result['records_per_s'] or 0:>10.0f} rec/s  "
+                  f"{result['peak_rss_mb']:>7.1f} MB")
+            results.append(result)
+    return results
+
+
+def write_results(results, result_dir=RESULT_DIR, **details):
+    """Writes a results file and returns its path; also kept as latest.json."""
+    os.makedirs(result_dir, exist_ok=True)
+    report = {"started": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0],
+              "cpu_count": os.cpu_count(), **details, "results": results}
+    path = os.path.join(result_dir, time.strftime("bench-%Y%m%d-%H%M%S.json"))
+    for target in (path, os.path.join(result_dir, "latest.json")):
+        with open(target, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return path
+
+
+def format_results(results):
+    lines = [f"{'stage':<14}{'scale':>6}{'records':>10}{'p50 s':>9}{'p95 s':>9}{'cpu s':>9}"
+             f"{'rss MB':>8}{'rec/s':>11}{'MB/s':>8}"]
+    for r in results:
+        if "error" in r:
+            lines.append(f"{r['stage']:<14}{r['scale']:>5g}x   error: {r['error']}")
+            continue
+        lines.append(f"{r['stage']:<14}{r['scale']:>5g}x{r['records']:>10}{r['wall_p50_s']:>9.3f}"
+                     f"{r['wall_p95_s']:>9.3f}{r['cpu_p50_s']:>9.3f}{r['peak_rss_mb']:>8.1f}"
+                     f"{r['records_per_s'] or 0:>11.0f}{r['mb_per_s'] or 0:>8.2f}")
+    return "\n".join(lines)
+
+
+def compare(baseline, results):
+    """p50 wall time and peak RSS of every stage and scale against a baseline results file."""
+    before = {(r["stage"], r["scale"]): r for r in baseline["results"] if "error" not in r}
+    lines = [f"{'stage':<14}{'scale':>6}{'p50 s':>22}{'speedup':>9}{'rss MB':>20}"]
+    for r in results:
+        old = before.get((r["stage"], r["scale"]))
+        if old is None or "error" in r:
+            continue
+        speedup = old["wall_p50_s"] / r["wall_p50_s"] if r["wall_p50_s"] else float("inf")
+        lines.append(f"{r['stage']:<14}{r['scale']:>5g}x{old['wall_p50_s']:>10.3f} -> {r['wall_p50_s']:<8.3f}"
+                     f"{speedup:>8.2f}x{old['peak_rss_mb']:>9.1f} -> {r['peak_rss_mb']:<7.1f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    if sys.argv[1:2] == ["measure"]:
+        # Internal: python bench_stages.py measure STAGE FOLDER --repeat N
+        parser = argparse.ArgumentParser()
+        parser.add_argument("stage")
+        parser.add_argument("folder")
+        parser.add_argument("--repeat", type=int, default=3)
+        args = parser.parse_args(sys.argv[2:])
+        print(json.dumps(measure_stage(args.stage, args.folder, args.repeat)))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic corpora of several sizes.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--scales", nargs="+", type=float, default=SCALES,
+                        help="Corpus sizes relative to the real one (default: 1 10 100)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage and scale")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Where the synthetic corpora are generated and kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", metavar="RESULTS", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)  # Read now: it may be latest.json, which this run replaces
+
+    results = run_benchmark(args.stages, args.scales, args.repeat, args.data_dir, args.seed)
+    path = write_results(results, repeat=args.repeat, seed=args.seed)
+    print()
+    print(format_results(results))
+    print(f"\nResults saved to {path}")
+    if baseline:
+        print()
+        print(compare(baseline, results))
+    # A failed stage leaves a hole in the curves; fail loudly rather than look like a finished run
+    failed = [f"{r['stage']} {r['scale']:g}x" for r in results if "error" in r]
+    if failed:
+        print(f"\n{len(failed)} stage runs failed: {', '.join(failed)}")
+        sys.exit(1)
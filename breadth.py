@@ -0,0 +1,148 @@
+"""
+breadth.py
+
+Curriculum breadth across catalog snapshots (1996, 2024, ...), over course
+titles and descriptions, for 15_curriculum_breadth.py.
+
+Every snapshot and field is one TokenStore (see token_store.py), so the
+text is tokenized once and cached. BreadthIndex lays all of them on one
+shared set of columns and keeps one sparse documents x terms CSR count
+matrix per (snapshot, field). Comparing N snapshots is one pass over their
+tokens; no model is refitted per snapshot:
+
+    index = BreadthIndex({("1996", "titles"): store_1996, ("2024", "titles"): store_2024}, stop_words)
+    index.diversity(("2024", "titles"), departments)  # {"distinct_terms": ..., "entropy_bits": ..., "by_department": ...}
+    index.top_terms(("2024", "titles"))               # [(term, mean TF-IDF weight), ...]
+
+The shared columns are either:
+- a joint vocabulary: every distinct token of every store gets one column,
+  in order of first appearance.
+- hashed (n_features): a token's column is crc32(token) % n_features, so the
+  width stays fixed however large the vocabulary grows. Tokens that collide
+  share a column, so distinct-term counts become lower bounds. top_terms()
+  then names a column by the first token seen in it.
+
+TF-IDF has one model per field, fitted on that field's documents across
+every snapshot together. A term's weight therefore means the same thing in
+1996 and in 2024.
+"""
+
+import zlib
+
+HASH_FEATURES = 2 ** 20  # Default width of hashed columns
+
+
+class BreadthIndex:
+    """Per-(snapshot, field) sparse term counts over columns shared by all snapshots."""
+
+    def __init__(self, stores, stop_words=frozenset(), n_features=None):
+        import numpy as np
+
+        self.stores = dict(stores)
+        self.n_features = n_features
+        # One pass over each store's vocabulary maps its ids to the shared columns
+        self.terms = {}  # Column -> token (hashed: the first non-stop-word token seen in the column)
+        index = {}
+        columns = {}
+        for key, store in self.stores.items():
+            columns[key] = np.empty(len(store.vocabulary), dtype=np.int64)
+            for token_id, word in enumerate(store.vocabulary):
+                if n_features is None:
+                    column = index.setdefault(word, len(index))
+                else:
+                    column = zlib.crc32(word.encode("utf-8")) % n_features
+                if word not in stop_words:  # Stop words are never counted, so never name a column
+                    self.terms.setdefault(column, word)
+                columns[key][token_id] = column
+        self.width = n_features or len(index)
+        self.matrices = {key: store.term_matrix(stop_words, columns[key], self.width)
+                         for key, store in self.stores.items()}
+        self._tfidf = {}
+
+    def term(self, column):
+        """The token of a column."""
+        return self.terms[column]
+
+    def tfidf(self, key):
+        """
+        TF-IDF matrix of (snapshot, field) `key`, under the model fitted on
+        that field across all snapshots. A `key` with no documents (say, a
+        catalog without descriptions) gets an empty matrix.
+        """
+        from scipy.sparse import vstack
+        from sklearn.feature_extraction.text import TfidfTransformer
+
+        if self.matrices[key].shape[0] == 0:
+            return self.matrices[key].astype(float)  # Nothing to weigh, and sklearn refuses 0 samples
+        field = key[1]
+        if field not in self._tfidf:
+            same_field = [matrix for (_, other), matrix in self.matrices.items() if other == field]
+            self._tfidf[field] = TfidfTransformer().fit(vstack(same_field))
+        return self._tfidf[field].transform(self.matrices[key])
+
+    def top_terms(self, key, count=10):
+        """The `count` terms with the highest mean TF-IDF weight in `key`'s documents ([] without documents)."""
+        import numpy as np
+
+        if self.matrices[key].shape[0] == 0:
+            return []
+        weights = np.asarray(self.tfidf(key).mean(axis=0)).ravel()
+        best = np.argsort(-weights, kind="stable")[:count]
+        return [(self.term(column), round(float(weights[column]), 4)) for column in best if weights[column] > 0]
+
+    def diversity(self, key, departments=None):
+        """
+        Breadth of `key`'s vocabulary: distinct terms, tokens and Shannon
+        entropy of the term distribution. With `departments` (one per
+        document) also the same per department, and how widely terms are
+        spread across departments.
+        """
+        import numpy as np
+        from scipy.sparse import csr_matrix
+
+        matrix = self.matrices[key]
+        totals = np.asarray(matrix.sum(axis=0)).ravel()
+        metrics = {"documents": matrix.shape[0], "tokens": int(totals.sum()),
+                   "distinct_terms": int(np.count_nonzero(totals)), "entropy_bits": _entropy(totals)}
+        if departments is None:
+            return metrics
+
+        import pandas as pd
+
+        codes, names = pd.factorize(pd.Series(list(departments), dtype=object).fillna("Unknown"))
+        # departments x documents indicator, times documents x terms: term counts per department
+        membership = csr_matrix((np.ones(len(codes), dtype=np.int32), (codes, np.arange(len(codes)))),
+                                shape=(len(names), matrix.shape[0]))
+        by_department = (membership @ matrix).tocsr()
+        by_department.sort_indices()
+
+        # Row-wise entropy, straight from the sparse data
+        row_totals = np.asarray(by_department.sum(axis=1)).ravel()
+        rows = np.repeat(np.arange(len(names)), np.diff(by_department.indptr))
+        p = by_department.data / row_totals[rows]
+        entropy = np.bincount(rows, weights=-p * np.log2(p), minlength=len(names))
+
+        spread = by_department.getnnz(axis=0)  # Departments using each term
+        spread = spread[spread > 0]
+        metrics.update({
+            "departments": len(names),
+            "mean_departments_per_term": round(float(spread.mean()), 3) if len(spread) else 0.0,
+            "shared_term_share": round(float((spread > 1).mean()), 4) if len(spread) else 0.0,
+            "by_department": {
+                name: {"documents": int(documents), "distinct_terms": int(distinct), "entropy_bits": round(float(bits), 4)}
+                for name, documents, distinct, bits in zip(names, np.bincount(codes, minlength=len(names)),
+                                                          by_department.getnnz(axis=1), entropy)
+            },
+        })
+        return metrics
+
+
+def _entropy(counts):
+    """Shannon entropy in bits of a count vector."""
+    import numpy as np
+
+    counts = counts[counts > 0]
+    if not len(counts):
+        return 0.0
+    p = counts / counts.sum()
+    return round(float(-(p * np.log2(p)).sum()), 4)